@@ -0,0 +1,110 @@
+"""
+Batch entry point for scheduling many advising requests at once.
+
+The catalog is interned (and its per catalog tables precomputed) once in the parent process. Workers are forked
+afterwards and inherit it, so no task carries the catalog; where fork is unavailable the catalog is handed to each
+worker once by the pool initializer instead. Requests are fanned out over the pool and their results stream back
+in completion order, each tagged with its position in the input and the time its search took.
+"""
+
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+from collections import namedtuple
+
+import williamju_scheduler
+from interned_catalog import intern_catalog
+
+# one finished request: index is its position in the input, result the SearchResult (None if the request raised,
+# error then holding the exception text) and seconds the wall time of its search inside the worker
+BatchResult = namedtuple('BatchResult', 'index, goal_conditions, initial_state, result, seconds, error')
+
+# catalog and search_schedule keyword arguments of the running batch, inherited by forked workers
+_catalog = None
+_options = {}
+
+
+def schedule_batch(course_descriptions, requests, processes=None, chunksize=1, max_pending=None, **options):
+    """
+    Schedules an iterable of (goal_conditions, initial_state) requests on a process pool. Requests are read from
+    the iterable only as workers free up: at most max_pending chunks are queued on the pool at once, so a long
+    stream of requests is never held in memory as a whole.
+    :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+    (or an InternedCatalog built from it)
+    :param requests: iterable of (goal_conditions, initial_state) pairs, consumed lazily
+    :param processes: number of worker processes, the number of CPUs by default
+    :param chunksize: number of requests handed to a worker at once
+    :param max_pending: number of chunks queued on the pool at once, two per worker by default
+    :param options: keyword arguments passed to williamju_scheduler.search_schedule, e.g. engine or time_limit
+    :return: generator of BatchResult in completion order
+    """
+    global _catalog, _options
+    processes = processes or os.cpu_count() or 1
+    max_pending = max_pending or 2 * processes
+    catalog = prepare_catalog(course_descriptions)
+    tasks = ((index, goal_conditions, initial_state) for index, (goal_conditions, initial_state)
+             in enumerate(requests))
+    if 'fork' in multiprocessing.get_all_start_methods():
+        _catalog, _options = catalog, options
+        pool = multiprocessing.get_context('fork').Pool(processes)
+    else:
+        pool = multiprocessing.Pool(processes, _init_worker, (catalog, options))
+    # finished chunks (lists of BatchResult), or the exception of a chunk the pool failed to run
+    finished = queue.SimpleQueue()
+    pending = 0
+    try:
+        while True:
+            chunk = list(itertools.islice(tasks, chunksize))
+            if chunk:
+                pool.apply_async(_schedule_chunk, (chunk,), callback=finished.put, error_callback=finished.put)
+                pending += 1
+            # wait for a chunk once the window is full, and for all of them once the requests are used up
+            while pending and (pending >= max_pending or not chunk):
+                batch_results = finished.get()
+                pending -= 1
+                if isinstance(batch_results, BaseException):
+                    raise batch_results
+                yield from batch_results
+            if not chunk:
+                return
+    finally:
+        pool.terminate()
+        pool.join()
+        _catalog, _options = None, {}
+
+
+def prepare_catalog(course_descriptions):
+    """
+    Interns a catalog and computes the tables the search builds lazily per catalog, so forked workers share
+    them instead of each computing its own copy.
+    :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+    :return: InternedCatalog
+    """
+    catalog = intern_catalog(course_descriptions)
+    williamju_scheduler.earliest_terms(catalog)
+    williamju_scheduler.filler_index(catalog)
+    if 'course_costs' not in catalog.derived:
+        catalog.derived['course_costs'] = williamju_scheduler.course_cost_estimates(catalog)
+    return catalog
+
+
+def _init_worker(catalog, options):
+    global _catalog, _options
+    _catalog, _options = catalog, options
+
+
+def _schedule_chunk(chunk):
+    return [_schedule_request(task) for task in chunk]
+
+
+def _schedule_request(task):
+    index, goal_conditions, initial_state = task
+    start = time.perf_counter()
+    try:
+        result = williamju_scheduler.search_schedule(_catalog, goal_conditions, initial_state, **_options)
+        error = None
+    except Exception as exception:
+        result, error = None, '%s: %s' % (type(exception).__name__, exception)
+    return BatchResult(index, goal_conditions, initial_state, result, time.perf_counter() - start, error)
@@ -0,0 +1,204 @@
+"""
+Benchmark harness for the scheduler.
+
+Runs the test cases documented in williamju_scheduler plus seeded synthetic requests against the shipped catalog
+and writes the measurements as JSON, so runs of different versions can be compared:
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+Catalog loading (workbook, snapshot, interning) is timed separately from the searches. Per case the wall time is
+the best of --repeat runs; peak memory is measured in one extra run under tracemalloc, which would otherwise
+distort the timings.
+"""
+
+import argparse
+import hashlib
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+import course_dictionary
+import williamju_scheduler
+from batch_scheduler import prepare_catalog
+
+BenchmarkCase = namedtuple('BenchmarkCase', 'name, goal_conditions, initial_state')
+
+DOCUMENTED_CASES = [
+    BenchmarkCase('test 1', [('CS', '1101')], [('CS', '1101')]),
+    BenchmarkCase('test 2', [('CS', '1101')], []),
+    BenchmarkCase('test 3', [('CS', '2231'), ('CS', '3251'), ('CS', 'statsprobability')],
+                  [('MATH', '2810'), ('MATH', '2820'), ('MATH', '3640')]),
+    BenchmarkCase('test 4', [('CS', 'major'), ('CS', '2201')], []),
+    BenchmarkCase('test 5', [('CS', 'major'), ('ANTH', '4345'), ('ARTS', '3600'), ('BME', '4500'),
+                             ('BUS', '2300'), ('CE', '3705'), ('LAT', '3140'), ('JAPN', '3891')], []),
+    BenchmarkCase('test 6', [('CS', 'major'), ('JAPN', '3891')], [('CS', '1101'), ('JAPN', '1101')]),
+    BenchmarkCase('test 7', [], []),
+    BenchmarkCase('test 8', [('ANTH', '4345'), ('ARTS', '3600'), ('BME', '4500'), ('BUS', '2300'),
+                             ('CE', '3705'), ('LAT', '3140'), ('JAPN', '3891')], []),
+    BenchmarkCase('test 9', [('CS', 'mathematics')], []),
+    BenchmarkCase('test 10', [('CS', 'major'), ('JAPN', '2201')], []),
+]
+
+
+def synthetic_cases(course_descriptions, count, seed):
+    """
+    Builds reproducible larger requests: a CS requirement group plus a handful of courses from other programs as
+    goals, and a few introductory courses as the initial state.
+    :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+    :param count: number of cases
+    :param seed: random seed, the same seed and catalog give the same cases
+    :return: list of BenchmarkCase
+    """
+    rng = random.Random(seed)
+    courses = sorted(course_descriptions)
+    groups = [course for course in courses if course.program == 'CS' and not course.designation.isnumeric()]
+    numbered = [course for course in courses if course.designation.isnumeric()]
+    introductory = [course for course in numbered if course.designation < '2000']
+    cases = []
+    for idx in range(count):
+        goals = [rng.choice(groups)] + rng.sample(numbered, rng.randint(2, 6))
+        cases.append(BenchmarkCase('synthetic %d' % (idx + 1), goals, rng.sample(introductory, rng.randint(0, 3))))
+    return cases
+
+
+def time_catalog_load(path):
+    """
+    Times loading the catalog from the workbook, from its snapshot and interning it together with the tables the
+    search derives per catalog.
+    :param path: location of the catalog workbook
+    :return: (course dictionary, dictionary of seconds per step)
+    """
+    start = time.perf_counter()
+    course_descriptions = course_dictionary.read_course_dict(path)
+    workbook_seconds = time.perf_counter() - start
+    # the first call writes the snapshot if it is missing or stale, the second one measures reading it
+    course_dictionary.create_course_dict(path)
+    start = time.perf_counter()
+    course_descriptions = course_dictionary.create_course_dict(path)
+    snapshot_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    prepare_catalog(course_descriptions)
+    intern_seconds = time.perf_counter() - start
+    return course_descriptions, {'workbook_seconds': workbook_seconds, 'snapshot_seconds': snapshot_seconds,
+                                 'intern_seconds': intern_seconds, 'courses': len(course_descriptions)}
+
+
+def run_case(course_descriptions, case, repeat, time_limit, options, measure_memory):
+    """
+    Runs one case and collects its measurements.
+    :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+    :param case: BenchmarkCase
+    :param repeat: number of timed runs, the fastest is reported
+    :param time_limit: wall clock budget in seconds per run
+    :param options: keyword arguments of williamju_scheduler.search_schedule
+    :param measure_memory: whether to add a run under tracemalloc for the peak memory
+    :return: dictionary of measurements
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = williamju_scheduler.search_schedule(course_descriptions, case.goal_conditions, case.initial_state,
+                                                     time_limit=time_limit, **options)
+        times.append(time.perf_counter() - start)
+    measurement = {
+        'name': case.name,
+        'goal_conditions': [list(course) for course in case.goal_conditions],
+        'initial_state': [list(course) for course in case.initial_state],
+        'status': result.status,
+        'nodes_expanded': result.nodes_expanded,
+        'seconds': min(times),
+        'all_seconds': times,
+        'scheduled_courses': len(result.schedule),
+        'schedule_digest': schedule_digest(result.schedule),
+        'peak_memory_bytes': None,
+    }
+    if measure_memory:
+        tracemalloc.start()
+        williamju_scheduler.search_schedule(course_descriptions, case.goal_conditions, case.initial_state,
+                                            time_limit=time_limit, **options)
+        measurement['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return measurement
+
+
+def schedule_digest(schedule):
+    """Hashes a scheduler output, in its order, so changes in the produced schedules show up between runs."""
+    lines = ['%s %s' % (tuple(course), tuple(course_info)) for course, course_info in schedule.items()]
+    return hashlib.sha256('\n'.join(lines).encode()).hexdigest()[:16]
+
+
+def code_version():
+    """Returns the git commit of the working tree, or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, stream=sys.stdout):
+    """
+    Prints the change per case against a baseline run.
+    :param results: benchmark results of this run
+    :param baseline: benchmark results of an earlier run
+    :param stream: file the table is written to
+    """
+    earlier = {case['name']: case for case in baseline['cases']}
+    print('%-14s %12s %12s %8s %12s %s' % ('case', 'seconds', 'baseline', 'ratio', 'nodes', 'schedule'),
+          file=stream)
+    for case in results['cases']:
+        old = earlier.get(case['name'])
+        if old is None:
+            continue
+        ratio = case['seconds'] / old['seconds'] if old['seconds'] else float('nan')
+        same = 'same' if case['schedule_digest'] == old['schedule_digest'] else 'CHANGED'
+        print('%-14s %12.4f %12.4f %8.2f %12s %s' % (case['name'], case['seconds'], old['seconds'], ratio,
+                                                      '%d/%d' % (case['nodes_expanded'], old['nodes_expanded']),
+                                                      same), file=stream)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmarks the course scheduler.')
+    parser.add_argument('--catalog', default=course_dictionary.CATALOG_PATH, help='catalog workbook')
+    parser.add_argument('--synthetic', type=int, default=10, help='number of synthetic cases')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic cases')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--time-limit', type=float, default=60.0, help='seconds per run')
+    parser.add_argument('--engine', default='dfs', choices=williamju_scheduler.SEARCH_ENGINES)
+    parser.add_argument('--weight', type=float, default=1.0, help='weight of the best_first engine')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory runs')
+    parser.add_argument('--output', help='file to write the JSON results to (default: stdout)')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args(argv[1:])
+
+    course_descriptions, catalog_load = time_catalog_load(args.catalog)
+    cases = DOCUMENTED_CASES + synthetic_cases(course_descriptions, args.synthetic, args.seed)
+    options = {'engine': args.engine, 'weight': args.weight}
+    results = {
+        'version': code_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {'engine': args.engine, 'weight': args.weight, 'repeat': args.repeat,
+                     'time_limit': args.time_limit, 'seed': args.seed, 'synthetic': args.synthetic},
+        'catalog_load': catalog_load,
+        'cases': [run_case(course_descriptions, case, args.repeat, args.time_limit, options, not args.no_memory)
+                  for case in cases],
+    }
+    if args.output:
+        with open(args.output, 'w') as results_file:
+            json.dump(results, results_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            # keeps the table out of the JSON when that goes to stdout
+            compare(results, json.load(baseline_file), sys.stdout if args.output else sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
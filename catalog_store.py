@@ -0,0 +1,189 @@
+"""
+Indexed on-disk catalog store.
+
+A CatalogStore is a read-only mapping of Course -> CourseInfo, usable wherever the scheduler takes the
+course_descriptions dict, backed by an SQLite file instead of memory. CourseInfo values are loaded on access and
+only the most recently used ones are kept, so a catalog merged from several schools costs each worker the interned
+arrays and a bounded cache rather than every CourseInfo. Besides the course table the store indexes courses by
+program, by offered semester and by whether they have prereqs; filler_index in williamju_scheduler reads its
+candidates from the last two through prereq_free_courses instead of scanning the catalog.
+    build_catalog_store(course_dictionary.create_course_dict(), 'catalog.store')
+    course_descriptions = CatalogStore('catalog.store')
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import ItemsView, Mapping, ValuesView
+
+from course_dictionary import Course, CourseInfo
+
+STORE_CACHE_SIZE = 4096
+STORE_SCHEMA = '''
+CREATE TABLE courses (id INTEGER PRIMARY KEY, program TEXT NOT NULL, designation TEXT NOT NULL, credits,
+                      terms TEXT NOT NULL, prereqs TEXT NOT NULL, has_prereqs INTEGER NOT NULL);
+CREATE UNIQUE INDEX courses_by_key ON courses (program, designation);
+CREATE INDEX courses_by_program ON courses (program, id);
+CREATE INDEX courses_by_prereqs ON courses (has_prereqs, id);
+CREATE TABLE course_terms (term TEXT NOT NULL, course_id INTEGER NOT NULL);
+CREATE INDEX course_terms_by_term ON course_terms (term, course_id);
+'''
+
+
+def build_catalog_store(course_descriptions, path):
+    """
+    Writes a course dictionary into a new store file, keeping its order; an existing file is replaced atomically.
+    :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+    :param path: location of the store
+    """
+    temp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        connection = sqlite3.connect(temp_path)
+        try:
+            connection.executescript(STORE_SCHEMA)
+            for course_id, (course, info) in enumerate(course_descriptions.items()):
+                # columns without a declared type keep the catalog's value types (credits are mostly strings)
+                connection.execute('INSERT INTO courses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                   (course_id, course[0], course[1], info.credits, json.dumps(info.terms),
+                                    json.dumps(info.prereqs), int(bool(info.prereqs))))
+                connection.executemany('INSERT INTO course_terms VALUES (?, ?)',
+                                       ((term, course_id) for term in info.terms))
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def course_info(credits, terms, prereqs):
+    """Rebuilds a CourseInfo from the columns of a course row, with the tuples create_course_dict produces."""
+    return CourseInfo(credits, tuple(json.loads(terms)),
+                      tuple(tuple(tuple(prereq) for prereq in disjunct) for disjunct in json.loads(prereqs)))
+
+
+class CatalogStore(Mapping):
+    def __init__(self, path, cache_size=STORE_CACHE_SIZE):
+        """
+        Opens a store written by build_catalog_store, read only.
+        :param path: location of the store
+        :param cache_size: number of CourseInfo values kept in memory, least recently used evicted first
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._length = self._query('SELECT COUNT(*) FROM courses')[0][0]
+
+    def __getstate__(self):
+        # the connection cannot be pickled; a copy reopens the file
+        return {'path': self.path, 'cache_size': self.cache_size}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['cache_size'])
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return (Course(program, designation) for program, designation
+                in self._rows('SELECT program, designation FROM courses ORDER BY id'))
+
+    def __contains__(self, course):
+        course = tuple(course)
+        return course in self._cache or bool(self._query(
+            'SELECT 1 FROM courses WHERE program = ? AND designation = ?', course))
+
+    def __getitem__(self, course):
+        course = tuple(course)
+        with self._lock:
+            info = self._cache.get(course)
+            if info is not None:
+                self._cache.move_to_end(course)
+                self.hits += 1
+                return info
+        rows = self._query('SELECT credits, terms, prereqs FROM courses WHERE program = ? AND designation = ?',
+                           course)
+        if not rows:
+            raise KeyError(course)
+        info = course_info(*rows[0])
+        with self._lock:
+            self.misses += 1
+            self._cache[course] = info
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return info
+
+    def values(self):
+        """Streams every CourseInfo in catalog order, bypassing the cache."""
+        return StoreValuesView(self)
+
+    def items(self):
+        """Streams every (Course, CourseInfo) pair in catalog order, bypassing the cache."""
+        return StoreItemsView(self)
+
+    def courses_in_program(self, program):
+        """Returns the courses of one program in catalog order."""
+        return [Course(program, designation) for designation,
+                in self._query('SELECT designation FROM courses WHERE program = ? ORDER BY id', (program,))]
+
+    def courses_offered(self, semester):
+        """Returns the courses offered in a semester (e.g. 'Fall') in catalog order."""
+        return [Course(*row) for row in self._query(
+            'SELECT program, designation FROM course_terms JOIN courses ON courses.id = course_id '
+            'WHERE term = ? ORDER BY course_id', (semester,))]
+
+    def prereq_free_courses(self, semester):
+        """Returns the courses without prereqs offered in a semester, in catalog order: the filler candidates."""
+        return [Course(*row) for row in self._query(
+            'SELECT program, designation FROM course_terms JOIN courses ON courses.id = course_id '
+            'WHERE term = ? AND has_prereqs = 0 ORDER BY course_id', (semester,))]
+
+    def close(self):
+        """Closes the file; it is reopened on the next lookup."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self):
+        # a connection must not be shared with a forked child, so each process opens its own
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect('file:%s?mode=ro' % self.path, uri=True, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._connection
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connect().execute(sql, parameters).fetchall()
+
+    def _rows(self, sql):
+        # a separate cursor streams the rows without holding the lock between them
+        with self._lock:
+            cursor = self._connect().execute(sql)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(256)
+            if not rows:
+                return
+            yield from rows
+
+
+class StoreValuesView(ValuesView):
+    def __iter__(self):
+        return (course_info(*row) for row in self._mapping._rows(
+            'SELECT credits, terms, prereqs FROM courses ORDER BY id'))
+
+
+class StoreItemsView(ItemsView):
+    def __iter__(self):
+        return ((Course(program, designation), course_info(credits, terms, prereqs))
+                for program, designation, credits, terms, prereqs in self._mapping._rows(
+                    'SELECT program, designation, credits, terms, prereqs FROM courses ORDER BY id'))
@@ -0,0 +1,181 @@
+"""
+Catalog hot reload for long-lived processes.
+
+A CatalogWatcher polls the catalog workbook's content hash. Once the workbook changes, the new course dictionary is
+loaded and diffed against the old one course by course, and a CatalogState holding the new dictionary and its
+interned catalog replaces the current one in a single assignment, so a reader always sees one consistent version.
+The tables the search derives per catalog are carried over from the old interned catalog as far as the edit allows
+(see carry_over_derived): an edit of some courses' credits only rebuilds what depends on credits, and the filler
+index is patched for the changed courses. Cached requirement sub-plans are kept unless the requirement's prereq
+closure touches a changed course.
+"""
+
+import threading
+from collections import namedtuple
+
+import course_dictionary
+import williamju_scheduler
+from batch_scheduler import prepare_catalog
+from interned_catalog import InternedCatalog
+
+# Course keys per kind of change; changed holds every key of credits, terms and prereqs
+CatalogDiff = namedtuple('CatalogDiff', 'added, removed, changed, credits, terms, prereqs')
+# one loaded version of the catalog
+CatalogState = namedtuple('CatalogState', 'course_descriptions, catalog, digest')
+
+POLL_INTERVAL = 5.0
+
+
+def diff_catalogs(old, new):
+    """
+    Compares two course dictionaries.
+    :param old: course dictionary before the edit
+    :param new: course dictionary after the edit
+    :return: CatalogDiff
+    """
+    added = frozenset(course for course in new if course not in old)
+    removed = frozenset(course for course in old if course not in new)
+    common = [course for course in new if course in old and new[course] != old[course]]
+    credits = frozenset(course for course in common if int(new[course].credits) != int(old[course].credits))
+    terms = frozenset(course for course in common if new[course].terms != old[course].terms)
+    prereqs = frozenset(course for course in common if new[course].prereqs != old[course].prereqs)
+    return CatalogDiff(added, removed, frozenset(common), credits, terms, prereqs)
+
+
+def carry_over_derived(old, new, diff):
+    """
+    Fills the derived tables of a freshly interned catalog from the catalog it replaces. Tables are only carried
+    over while both catalogs have the same course ids (no course added or removed):
+        prereq_uses, closure_masks - kept unless prereqs changed
+        earliest_terms             - kept unless prereqs or offered terms changed
+        course_costs               - kept unless prereqs or credits changed
+        offered_terms              - kept, the entries of courses with changed terms recomputed
+        filler_index               - patched for the changed courses, see patch_filler_index
+    Anything not carried over is rebuilt on first use.
+    :param old: InternedCatalog of the catalog before the edit
+    :param new: InternedCatalog of the catalog after the edit
+    :param diff: CatalogDiff of the edit
+    :return: names of the tables carried over
+    """
+    if old.courses != new.courses:
+        return []
+    derived = old.derived
+    carried = []
+    if not diff.prereqs:
+        carried += ['prereq_uses', 'closure_masks']
+        if not diff.terms:
+            carried.append('earliest_terms')
+        if not diff.credits:
+            carried.append('course_costs')
+    for name in carried:
+        if name in derived:
+            new.derived[name] = derived[name]
+    if 'offered_terms' in derived:
+        masks = derived['offered_terms'].copy()
+        for course in diff.terms:
+            course_id = new.ids[course]
+            masks[course_id] = williamju_scheduler.schedule_term_mask(new.term_masks[course_id])
+        new.derived['offered_terms'] = masks
+        carried.append('offered_terms')
+    if 'filler_index' in derived:
+        new.derived['filler_index'] = williamju_scheduler.patch_filler_index(
+            new, derived['filler_index'], [new.ids[course] for course in diff.changed])
+        carried.append('filler_index')
+    return [name for name in carried if name in new.derived]
+
+
+def affected_requirements(catalog, diff):
+    """
+    Returns a predicate telling whether the plans of a requirement course may change with an edit: whether the
+    course or anything in its prereq closure (in the catalog before the edit) was edited, added or removed.
+    :param catalog: InternedCatalog of the catalog before the edit
+    :param diff: CatalogDiff of the edit
+    :return: callable taking a Course key
+    """
+    edited = 0
+    for course in diff.added | diff.removed | diff.changed:
+        if course in catalog.ids:
+            edited |= 1 << catalog.ids[course]
+    closures = catalog.closure_masks()
+
+    def affected(requirement):
+        course_id = catalog.ids.get(requirement)
+        return course_id is None or bool(closures[course_id] & edited)
+
+    return affected
+
+
+class CatalogWatcher:
+    def __init__(self, path=course_dictionary.CATALOG_PATH, sub_plans=None, on_reload=None,
+                 poll_interval=POLL_INTERVAL):
+        """
+        Loads the catalog and prepares its interned form.
+        :param path: location of the catalog workbook
+        :param sub_plans: SubPlanCache whose entries follow the catalog across reloads, or None
+        :param on_reload: callable receiving (old CatalogState, new CatalogState, CatalogDiff) after a reload
+        :param poll_interval: seconds between checks of the background thread
+        """
+        self.path = path
+        self.sub_plans = sub_plans
+        self.on_reload = on_reload
+        self.poll_interval = poll_interval
+        digest = course_dictionary.catalog_digest(path)
+        course_descriptions = course_dictionary.create_course_dict(path)
+        self.state = CatalogState(course_descriptions, prepare_catalog(course_descriptions), digest)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def catalog(self):
+        """The interned catalog of the current version."""
+        return self.state.catalog
+
+    def check(self):
+        """
+        Reloads the catalog if the workbook changed since the last check.
+        :return: CatalogDiff of the reload, or None if the workbook is unchanged
+        """
+        with self._lock:
+            old = self.state
+            try:
+                digest = course_dictionary.catalog_digest(self.path)
+            except OSError:
+                # the workbook is being replaced; the next check picks the new one up
+                return None
+            if digest == old.digest:
+                return None
+            course_descriptions = course_dictionary.create_course_dict(self.path)
+            diff = diff_catalogs(old.course_descriptions, course_descriptions)
+            catalog = InternedCatalog(course_descriptions)
+            carry_over_derived(old.catalog, catalog, diff)
+            new = CatalogState(course_descriptions, prepare_catalog(catalog), digest)
+            if self.sub_plans is not None:
+                self.sub_plans.migrate(old.catalog.fingerprint(), catalog.fingerprint(),
+                                       affected_requirements(old.catalog, diff))
+            self.state = new
+        if self.on_reload is not None:
+            self.on_reload(old, new, diff)
+        return diff
+
+    def start(self):
+        """Starts checking every poll_interval seconds on a daemon thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll, name='catalog-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the background thread."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception:
+                # e.g. a workbook caught half written; the digest is left as is, so the next poll retries
+                continue
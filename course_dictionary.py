@@ -1,34 +1,261 @@
+import argparse
+import csv
+import functools
+import hashlib
+import json
+import os
+import pickle
 import re
+import sqlite3
+import sys
 from collections import namedtuple
-from openpyxl import load_workbook
 
-def create_course_dict():
+CATALOG_PATH = 'newcatalog.xlsx'
+CATALOG_COLUMNS = ('program', 'designation', 'credits', 'terms', 'prereqs')
+CATALOG_CACHE_SUFFIX = '.cache'
+# bump whenever the snapshot layout or the parsing of a row changes so stale snapshots are rebuilt
+CATALOG_CACHE_VERSION = 1
+COURSE_PATTERN = re.compile('((?:[A-Z]+-)?[A-Z]+)(.+)')
+
+Course = namedtuple('Course', 'program, designation')
+CourseInfo = namedtuple('CourseInfo', 'credits, terms, prereqs')
+
+
+def create_course_dict(path=CATALOG_PATH, cache_path=None, use_cache=True):
     """
     Creates a dictionary containing course info.
     Keys: namedtuple of the form ('program, designation')
     Values: namedtuple of the form('name, prereqs, credits')
             prereqs is a tuple of prereqs where each prereq has the same form as the keys
+    The parsed catalog is kept in a binary snapshot next to the workbook (path + '.cache'). The snapshot is
+    keyed by the content hash of the workbook, so it is reused while the workbook is unchanged and rebuilt
+    automatically once the workbook is edited.
+    :param path: location of the catalog workbook
+    :param cache_path: location of the snapshot, defaults to the workbook path with a '.cache' suffix
+    :param use_cache: whether to read and write the snapshot at all
+    :return: dictionary of Course -> CourseInfo
     """
-    wb = load_workbook('newcatalog.xlsx')
-    catalog = wb.get_sheet_by_name('catalog')
-    Course = namedtuple('Course', 'program, designation')
-    CourseInfo = namedtuple('CourseInfo', 'credits, terms, prereqs')
-    course_dict = {}
-    for row in range(1, catalog.max_row + 1):
-        key = Course(get_val(catalog, 'A', row), get_val(catalog, 'B', row))
-        prereqs = tuple(tuple(get_split_course(prereq) for prereq in prereqs.split())
-                   for prereqs in none_split(get_val(catalog, 'E', row)))
-        val = CourseInfo(get_val(catalog, 'C', row), tuple(get_val(catalog, 'D', row).split()), prereqs)
-        course_dict[key] = val
+    if not use_cache:
+        return read_course_dict(path)
+    cache_path = cache_path if cache_path else path + CATALOG_CACHE_SUFFIX
+    digest = catalog_digest(path)
+    course_dict = load_catalog_cache(cache_path, digest)
+    if course_dict is None:
+        course_dict = read_course_dict(path)
+        save_catalog_cache(cache_path, digest, course_dict)
     return course_dict
 
 
+def read_course_dict(path=CATALOG_PATH):
+    """
+    Builds the course dictionary directly from the catalog file, bypassing the snapshot. The rows are streamed
+    once, so memory stays bounded by a single row.
+    :param path: location of the catalog, in any format of CATALOG_READERS (by file extension)
+    :return: dictionary of Course -> CourseInfo
+    """
+    return dict(parse_row(row) for row in read_catalog_rows(path) if row[0] is not None)
+
+
+def catalog_format(path):
+    """Returns the catalog format of a file by its extension, e.g. 'xlsx' or 'jsonl'."""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return CATALOG_FORMATS.get(extension, extension)
+
+
+def read_catalog_rows(path):
+    """
+    Streams the raw (program, designation, credits, terms, prereqs) rows of a catalog file. terms is the space
+    separated semester names and prereqs the comma separated disjunctions, as in the workbook's columns A-E.
+    :param path: location of the catalog
+    :return: iterator of row tuples
+    """
+    reader = CATALOG_READERS.get(catalog_format(path))
+    if reader is None:
+        raise ValueError('unknown catalog format: %s' % path)
+    return reader(path)
+
+
+def read_xlsx_rows(path):
+    """Rows of the 'catalog' sheet of a workbook. openpyxl is only imported for this format."""
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True)
+    try:
+        yield from wb['catalog'].iter_rows(max_col=5, values_only=True)
+    finally:
+        wb.close()
+
+
+def read_csv_rows(path):
+    """
+    Rows of a CSV file with a header line naming CATALOG_COLUMNS. write_csv_rows quotes every string, so in a file
+    whose header is quoted the unquoted fields are values the workbook stores as numbers (the credit counts of 371
+    courses, e.g. AADS 3850) and are read back as numbers. A file with an unquoted header, e.g. one exported by
+    hand, is read as strings only.
+    """
+    with open(path, newline='') as catalog_file:
+        quoting = csv.QUOTE_NONNUMERIC if catalog_file.read(1) == '"' else csv.QUOTE_MINIMAL
+        catalog_file.seek(0)
+        for row in csv.DictReader(catalog_file, quoting=quoting):
+            # the csv module reads every number as a float
+            yield tuple(int(value) if isinstance(value, float) and value.is_integer() else value
+                        for value in (row[column] for column in CATALOG_COLUMNS))
+
+
+def read_jsonl_rows(path):
+    """Rows of a JSON lines file, one object with the CATALOG_COLUMNS keys per line; blank lines are skipped."""
+    with open(path) as catalog_file:
+        for line in catalog_file:
+            if line.strip():
+                row = json.loads(line)
+                yield tuple(row.get(column) for column in CATALOG_COLUMNS)
+
+
+def read_sqlite_rows(path):
+    """Rows of the catalog table of an SQLite database, in insertion order."""
+    connection = sqlite3.connect('file:%s?mode=ro' % path, uri=True)
+    try:
+        yield from connection.execute('SELECT %s FROM catalog ORDER BY rowid' % ', '.join(CATALOG_COLUMNS))
+    finally:
+        connection.close()
+
+
+def write_catalog_rows(path, rows):
+    """
+    Writes raw catalog rows to a file in the format given by its extension; the file is replaced atomically.
+    :param path: destination, a .csv, .jsonl or .sqlite file
+    :param rows: iterable of (program, designation, credits, terms, prereqs) tuples
+    """
+    writer = CATALOG_WRITERS.get(catalog_format(path))
+    if writer is None:
+        raise ValueError('cannot write catalog format: %s' % path)
+    temp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        writer(temp_path, rows)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def write_csv_rows(path, rows):
+    """
+    Writes rows as CSV with a header line. Strings are quoted and numbers are not, which read_csv_rows uses to
+    restore the value types; a missing value becomes an empty string.
+    """
+    with open(path, 'w', newline='') as catalog_file:
+        writer = csv.writer(catalog_file, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(CATALOG_COLUMNS)
+        writer.writerows(('' if value is None else value for value in row) for row in rows)
+
+
+def write_jsonl_rows(path, rows):
+    """Writes rows as JSON lines, one object per row."""
+    with open(path, 'w') as catalog_file:
+        for row in rows:
+            catalog_file.write(json.dumps(dict(zip(CATALOG_COLUMNS, row))) + '\n')
+
+
+def write_sqlite_rows(path, rows):
+    """Writes rows into the catalog table of a new SQLite database."""
+    connection = sqlite3.connect(path)
+    try:
+        # columns without a declared type keep the workbook's value types
+        connection.execute('CREATE TABLE catalog (%s)' % ', '.join(CATALOG_COLUMNS))
+        connection.executemany('INSERT INTO catalog VALUES (?, ?, ?, ?, ?)', rows)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def convert_catalog(source, destination):
+    """
+    Converts a catalog file into another format, e.g. the workbook into JSON lines. Rows are copied unparsed, so
+    the destination reads back into the same course dictionary.
+    :param source: catalog to read
+    :param destination: catalog to write, its format given by the extension
+    :return: number of rows written
+    """
+    rows = [tuple(row) for row in read_catalog_rows(source) if row[0] is not None]
+    write_catalog_rows(destination, rows)
+    return len(rows)
+
+
+# readers and writers of the raw catalog rows by format, and the file extensions naming each format
+CATALOG_READERS = {'xlsx': read_xlsx_rows, 'csv': read_csv_rows, 'jsonl': read_jsonl_rows, 'sqlite': read_sqlite_rows}
+CATALOG_WRITERS = {'csv': write_csv_rows, 'jsonl': write_jsonl_rows, 'sqlite': write_sqlite_rows}
+CATALOG_FORMATS = {'db': 'sqlite', 'sqlite3': 'sqlite'}
+
+
+def parse_row(row):
+    """
+    Converts the values of one catalog row (program, designation, credits, terms, prereqs) into a
+    (Course, CourseInfo) pair.
+    """
+    program, designation, credits, terms, prereqs = row
+    return (Course(program, designation),
+            CourseInfo(credits, tuple(terms.split()),
+                       tuple(tuple(get_split_course(prereq) for prereq in disjunct.split())
+                             for disjunct in none_split(prereqs))))
+
+
+def catalog_digest(path):
+    """Returns the sha256 hex digest of a catalog file's contents."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as catalog_file:
+        for chunk in iter(lambda: catalog_file.read(1 << 16), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def load_catalog_cache(cache_path, digest):
+    """
+    Loads a catalog snapshot written by save_catalog_cache.
+    :param cache_path: location of the snapshot
+    :param digest: content hash of the catalog the snapshot must have been built from
+    :return: course dictionary, or None if the snapshot is missing, unreadable or stale
+    """
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            version, cached_digest, rows = pickle.load(cache_file)
+        if version != CATALOG_CACHE_VERSION or cached_digest != digest:
+            return None
+        return {Course(program, designation): CourseInfo(credits, terms, prereqs)
+                for program, designation, credits, terms, prereqs in rows}
+    except Exception:
+        # a corrupt or foreign pickle can raise nearly anything; it is rebuilt like a stale snapshot
+        return None
+
+
+def save_catalog_cache(cache_path, digest, course_dict):
+    """
+    Writes a compact snapshot of the course dictionary. Rows are stored as plain tuples so the snapshot does not
+    depend on the namedtuple classes. The file is replaced atomically; an unwritable location is ignored.
+    :param cache_path: location of the snapshot
+    :param digest: content hash of the catalog the dictionary was built from
+    :param course_dict: course dictionary to store
+    """
+    rows = tuple((key.program, key.designation, val.credits, val.terms, val.prereqs)
+                 for key, val in course_dict.items())
+    temp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+    try:
+        with open(temp_path, 'wb') as cache_file:
+            pickle.dump((CATALOG_CACHE_VERSION, digest, rows), cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+# a catalog names the same few hundred prereqs thousands of times
+@functools.lru_cache(maxsize=None)
 def get_split_course(course):
     """
     Parses a course from programdesignation into the ('program, designation') form.
     e.g. 'CS1101' -> ('CS', '1101')
     """
-    return tuple(split_course for course_part in re.findall('((?:[A-Z]+-)?[A-Z]+)(.+)', course)
+    return tuple(split_course for course_part in COURSE_PATTERN.findall(course)
                  for split_course in course_part)
 
 
@@ -45,4 +272,16 @@ def get_val(catalog, col, row):
 def print_dict(dict):
     """Simply prints a dictionary's key and values line by line."""
     for key in dict:
-        print(key, dict[key])
\ No newline at end of file
+        print(key, dict[key])
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Converts the course catalog into another format.')
+    parser.add_argument('source', nargs='?', default=CATALOG_PATH, help='catalog to convert')
+    parser.add_argument('destination', help='file to write, .csv, .jsonl or .sqlite')
+    args = parser.parse_args(argv[1:])
+    print('%d courses written to %s' % (convert_catalog(args.source, args.destination), args.destination))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -1,10 +1,15 @@
 import sys
 
 import course_dictionary
+import scheduling_service
 import williamju_scheduler
 
 
 def main(argv):
+    if argv[1:2] == ['serve']:
+        # long-running mode keeping the catalog warm, see scheduling_service
+        scheduling_service.main(argv[1:])
+        return
     test = course_dictionary.create_course_dict()
     #Test to see if all prereqs are in the file.
     # prereq_list = [single_course for vals in test.values()
@@ -0,0 +1,256 @@
+"""
+Integer-interned, array-backed form of the course dictionary.
+
+The scheduler works on dense integer course ids instead of (program, designation) string tuples. Per course the
+interned catalog holds the credit hours as an int, the offered semesters as a bitmask (one bit per Semester value)
+and the prerequisite DNF in CSR form: the disjuncts of course c are disjunct_start[c]:disjunct_start[c + 1] and the
+prereqs of disjunct d are prereq_ids[prereq_start[d]:prereq_start[d + 1]]. The original keys and CourseInfo values
+are kept alongside so results can be translated back once the search is done. A course_descriptions mapping other
+than a dict (e.g. a catalog_store.CatalogStore) is read in streaming passes and its CourseInfo values are looked up
+again on demand instead of being copied.
+"""
+
+import hashlib
+from array import array
+from bisect import bisect_right
+from itertools import chain, repeat
+
+UNREACHABLE = float('inf')
+# bit per Semester value (Fall = 1, Spring = 2, Summer = 3), by the names used in the catalog's terms column
+SEMESTER_BITS = {'Fall': 1, 'Spring': 2, 'Summer': 4}
+
+
+def is_higher_requirement(course):
+    """
+    Checks if the course parameter is a higher requirement type.
+    :param course: course being checked if higher requirement
+    :return: boolean whether course is a higher requirement type
+    """
+    if course[1][len(course[1]) - 1] == 'W':
+        return not course[1][:-1].isnumeric()
+    return not course[1].isnumeric()
+
+
+def semester_mask(terms):
+    """Converts a tuple of offered semester names into a Semester bitmask, ignoring unknown names."""
+    mask = 0
+    for term in terms:
+        mask |= SEMESTER_BITS.get(term, 0)
+    return mask
+
+
+def heuristic_weight(prereqs):
+    """
+    Sums the front value of the designation (4 of 4260) over a prereq disjunction, skipping higher requirements.
+    The sum is a rough measure of the prerequisite layers needed to fulfill the disjunction.
+    """
+    return sum(int(course[1][0]) for course in prereqs if not is_higher_requirement(course))
+
+
+class InternedCatalog:
+    def __init__(self, course_descriptions):
+        """
+        Interns every course of the dictionary, in dictionary order, followed by any prereq that is missing from
+        the dictionary. Missing courses have no description and are never offered, so no branch can use them.
+        :param course_descriptions: dictionary of offered Vanderbilt courses and related information, or any mapping
+        of the same content
+        """
+        self.source = course_descriptions
+        self.courses = list(course_descriptions)
+        self.ids = {course: idx for idx, course in enumerate(self.courses)}
+        self.catalog_size = len(self.courses)
+        for info in course_descriptions.values():
+            for prereqs in info.prereqs:
+                for prereq in prereqs:
+                    if prereq not in self.ids:
+                        self.ids[prereq] = len(self.courses)
+                        self.courses.append(prereq)
+
+        def infos():
+            # every course's CourseInfo in id order, None for the missing prereqs
+            return chain(course_descriptions.values(), repeat(None, len(self.courses) - self.catalog_size))
+
+        if isinstance(course_descriptions, dict):
+            self.descriptions = list(infos())
+        else:
+            self.descriptions = LazyDescriptions(course_descriptions, self.courses, self.catalog_size)
+        self.credits = array('i', (int(info.credits) if info else 0 for info in infos()))
+        self.term_masks = array('B', (semester_mask(info.terms) if info else 0 for info in infos()))
+        self.higher = bytearray(is_higher_requirement(course) for course in self.courses)
+        self.disjunct_start = array('i', [0])
+        self.prereq_start = array('i', [0])
+        self.prereq_ids = array('i')
+        # disjunct ids of each course in the order prereq_heuristic pushes them (least promising first)
+        self.heuristic_order = array('i')
+        for info in infos():
+            prereq_sets = info.prereqs if info else ()
+            first = len(self.prereq_start) - 1
+            for prereqs in prereq_sets:
+                self.prereq_ids.extend(self.ids[prereq] for prereq in prereqs)
+                self.prereq_start.append(len(self.prereq_ids))
+            weighted = sorted((heuristic_weight(prereqs), prereqs, first + offset)
+                              for offset, prereqs in enumerate(prereq_sets))
+            self.heuristic_order.extend(disjunct for _, _, disjunct in reversed(weighted))
+            self.disjunct_start.append(len(self.prereq_start) - 1)
+        # tables derived from the catalog on first use (by name), so they are computed once per catalog
+        self.derived = {}
+
+    def __len__(self):
+        return len(self.courses)
+
+    def intern(self, course):
+        """Returns the id of a course given as a (program, designation) pair; KeyError if it is not in the catalog."""
+        course_id = self.ids[tuple(course)]
+        if self.descriptions[course_id] is None:
+            raise KeyError(course)
+        return course_id
+
+    def intern_all(self, courses):
+        """Returns the set of ids of the known courses among courses; unknown courses are ignored."""
+        return {self.ids[tuple(course)] for course in courses if tuple(course) in self.ids}
+
+    def description(self, course_id):
+        """Returns the CourseInfo of a course id; KeyError for prereqs missing from the dictionary."""
+        info = self.descriptions[course_id]
+        if info is None:
+            raise KeyError(self.courses[course_id])
+        return info
+
+    def disjuncts(self, course_id):
+        """Returns the range of disjunct ids of a course's prereqs, in catalog order."""
+        return range(self.disjunct_start[course_id], self.disjunct_start[course_id + 1])
+
+    def ordered_disjuncts(self, course_id):
+        """Returns the disjunct ids of a course's prereqs in the order prereq_heuristic pushes them."""
+        return self.heuristic_order[self.disjunct_start[course_id]:self.disjunct_start[course_id + 1]]
+
+    def prereqs(self, disjunct):
+        """Returns the course ids of one prereq disjunct."""
+        return self.prereq_ids[self.prereq_start[disjunct]:self.prereq_start[disjunct + 1]]
+
+    def closure_costs(self, unit_costs):
+        """
+        Returns per course its own unit cost plus, over its cheapest disjunct, the closure cost of every prereq
+        (a prereq shared by several branches is counted once per branch). Courses only reachable through a prereq
+        cycle are UNREACHABLE.
+        :param unit_costs: sequence of the cost of taking each course by itself
+        """
+        return self._relax(lambda course: unit_costs[course],
+                           lambda course, values: unit_costs[course] + sum(values))
+
+    def disjunct_at(self, position):
+        """Returns the id of the disjunct whose prereqs hold prereq_ids[position]."""
+        return bisect_right(self.prereq_start, position) - 1
+
+    def closure_masks(self):
+        """
+        Returns per course a bitmask (bit per course id) of the course itself and every course in its transitive
+        prereq closure, over all of its disjuncts: the courses that can be pushed while it is expanded.
+        """
+        if 'closure_masks' not in self.derived:
+            masks = [1 << course for course in range(len(self))]
+            changed = True
+            while changed:
+                changed = False
+                for course in range(len(self)):
+                    mask = masks[course]
+                    for prereq in self.prereq_ids[self.prereq_start[self.disjunct_start[course]]:
+                                                  self.prereq_start[self.disjunct_start[course + 1]]]:
+                        mask |= masks[prereq]
+                    if mask != masks[course]:
+                        masks[course] = mask
+                        changed = True
+            self.derived['closure_masks'] = masks
+        return self.derived['closure_masks']
+
+    def fingerprint(self):
+        """
+        Returns a digest of the interned content (courses, credits, offered semesters and prereqs), so results
+        derived from one catalog can be told apart from those of an edited one.
+        """
+        if 'fingerprint' not in self.derived:
+            digest = hashlib.sha256()
+            digest.update(repr(self.courses).encode())
+            for table in (self.credits, self.term_masks, self.disjunct_start, self.prereq_start, self.prereq_ids):
+                digest.update(table.tobytes())
+            self.derived['fingerprint'] = digest.hexdigest()[:16]
+        return self.derived['fingerprint']
+
+    def prereq_uses(self):
+        """Returns per course the (dependent course, disjunct) pairs whose prereq disjunct names it."""
+        if 'prereq_uses' not in self.derived:
+            uses = [[] for _ in range(len(self))]
+            for course in range(len(self)):
+                for disjunct in self.disjuncts(course):
+                    for prereq in self.prereqs(disjunct):
+                        uses[prereq].append((course, disjunct))
+            self.derived['prereq_uses'] = uses
+        return self.derived['prereq_uses']
+
+    def _relax(self, base, combine):
+        """
+        Computes a per course value over the prereq DNF by relaxation until nothing changes: courses without prereqs
+        get base(course), other courses the minimum of combine(course, prereq values) over their disjuncts.
+        """
+        values = [base(course) if not self.disjuncts(course) else UNREACHABLE for course in range(len(self))]
+        changed = True
+        while changed:
+            changed = False
+            for course in range(len(self)):
+                for disjunct in self.disjuncts(course):
+                    value = combine(course, [values[prereq] for prereq in self.prereqs(disjunct)])
+                    if value < values[course]:
+                        values[course] = value
+                        changed = True
+        return values
+
+    def prereq_tuple(self, course_id, disjunct):
+        """Returns the original prereq tuple of a disjunct, or () for disjunct -1 (no prereqs)."""
+        if disjunct < 0:
+            return ()
+        return self.descriptions[course_id].prereqs[disjunct - self.disjunct_start[course_id]]
+
+
+class LazyDescriptions:
+    def __init__(self, course_descriptions, courses, catalog_size):
+        """
+        Sequence of the CourseInfo of every course id, looked up in the mapping on access.
+        :param course_descriptions: mapping of Course -> CourseInfo
+        :param courses: course keys by id
+        :param catalog_size: number of courses in the mapping; the ids after them are missing prereqs (None)
+        """
+        self.course_descriptions = course_descriptions
+        self.courses = courses
+        self.catalog_size = catalog_size
+
+    def __len__(self):
+        return len(self.courses)
+
+    def __getitem__(self, course_id):
+        if course_id < 0:
+            course_id += len(self.courses)
+        if course_id >= self.catalog_size:
+            if course_id >= len(self.courses):
+                raise IndexError(course_id)
+            return None
+        return self.course_descriptions[self.courses[course_id]]
+
+
+_interned = None
+
+
+def intern_catalog(course_descriptions):
+    """
+    Returns the interned form of a course dictionary. The most recently interned dictionary is remembered by
+    identity so repeated scheduler calls on the same catalog intern it only once; a dictionary must therefore not
+    be edited in place once it has been handed to the scheduler. An InternedCatalog is returned as is.
+    :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+    :return: InternedCatalog
+    """
+    global _interned
+    if isinstance(course_descriptions, InternedCatalog):
+        return course_descriptions
+    if _interned is None or _interned[0] is not course_descriptions \
+            or _interned[1].catalog_size != len(course_descriptions):
+        _interned = (course_descriptions, InternedCatalog(course_descriptions))
+    return _interned[1]
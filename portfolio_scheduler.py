@@ -0,0 +1,123 @@
+"""
+Parallel portfolio search for a single hard request.
+
+Several searches for the same request run side by side in worker processes: the sequential depth first search,
+a greedy best first search and depth first searches over disjoint shares of the search tree (split_branches in
+williamju_scheduler). The first member to find a valid schedule wins and the others are cancelled. Since the
+shares together cover the whole tree, the request is proven infeasible once every share (or any member
+searching the whole tree) runs out of options.
+"""
+
+import multiprocessing
+import os
+import queue
+import time
+from collections import namedtuple
+
+import williamju_scheduler
+from batch_scheduler import prepare_catalog
+
+# one search of the portfolio; branch_share is None for a member searching the whole tree
+PortfolioMember = namedtuple('PortfolioMember', 'engine, weight, branch_share')
+# seconds a cancelled member gets to notice the cancellation before it is terminated
+CANCEL_GRACE_PERIOD = 1.0
+
+
+def portfolio_members(processes):
+    """
+    Picks the searches run side by side on a number of processes: depth first search over the whole tree, then best
+    first search with weight 3, then the remaining processes split the tree into shares (with a single one left
+    it runs best first search with weight 1 instead).
+    :param processes: number of worker processes
+    :return: list of PortfolioMember
+    """
+    members = [PortfolioMember('dfs', 1.0, None), PortfolioMember('best_first', 3.0, None)][:processes]
+    shares = processes - len(members)
+    if shares == 1:
+        members.append(PortfolioMember('best_first', 1.0, None))
+    elif shares > 1:
+        members += [PortfolioMember('dfs', 1.0, (share, shares)) for share in range(shares)]
+    return members
+
+
+def portfolio_schedule(course_descriptions, goal_conditions, initial_state, processes=None, time_limit=None,
+                       **options):
+    """
+    Runs a portfolio of searches for one request and returns the first valid schedule found.
+    :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+    (or an InternedCatalog built from it)
+    :param goal_conditions: list of courses required in a valid schedule
+    :param initial_state: list of courses already fulfilled, not scheduled
+    :param processes: number of worker processes, the number of CPUs by default
+    :param time_limit: wall clock budget in seconds for the whole portfolio, None for no limit
+    :param options: further keyword arguments of williamju_scheduler.search_schedule, e.g. node_limit
+    :return: SearchResult of the winning member; without a winner, the proof of infeasibility or the partial result
+    with the fewest remaining goals, with nodes_expanded summed over all members
+    """
+    catalog = prepare_catalog(course_descriptions)
+    members = portfolio_members(processes or os.cpu_count() or 1)
+    start_methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in start_methods else None)
+    cancel = context.Event()
+    results = context.Queue()
+    workers = [context.Process(target=_run_member, daemon=True,
+                               args=(results, cancel, catalog, member, goal_conditions, initial_state, options))
+               for member in members]
+    for worker in workers:
+        worker.start()
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    finished = []
+    winner = None
+    try:
+        while len(finished) < len(members):
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                member, result = results.get(timeout=timeout)
+            except queue.Empty:
+                # out of time: cancelled members still report their partial results
+                cancel.set()
+                deadline = None
+                continue
+            if isinstance(result, Exception):
+                raise result
+            finished.append((member, result))
+            if result.status == 'solved':
+                winner = result
+                break
+            if result.status == 'infeasible' and _proven_infeasible(members, finished):
+                break
+    finally:
+        cancel.set()
+        for worker in workers:
+            worker.join(CANCEL_GRACE_PERIOD)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+    nodes_expanded = sum(result.nodes_expanded for _, result in finished)
+    if winner is not None:
+        return winner._replace(nodes_expanded=nodes_expanded)
+    best = min((result for _, result in finished), key=lambda result: len(result.remaining_goals))
+    if _proven_infeasible(members, finished):
+        return best._replace(status='infeasible', complete=True, nodes_expanded=nodes_expanded)
+    # a member stopped by the portfolio's time limit reports as cancelled
+    status = 'time_limit' if best.status == 'cancelled' and time_limit is not None else best.status
+    return best._replace(status=status, complete=False, nodes_expanded=nodes_expanded)
+
+
+def _proven_infeasible(members, finished):
+    exhausted = [member for member, result in finished if result.status == 'infeasible']
+    if any(member.branch_share is None for member in exhausted):
+        return True
+    shares = [member for member in members if member.branch_share is not None]
+    return bool(shares) and all(member in exhausted for member in shares)
+
+
+def _run_member(results, cancel, catalog, member, goal_conditions, initial_state, options):
+    try:
+        result = williamju_scheduler.search_schedule(catalog, goal_conditions, initial_state, member.engine,
+                                                     member.weight, cancel=cancel, branch_share=member.branch_share,
+                                                     **options)
+    except Exception as exception:
+        # handed to the parent, which raises it
+        result = exception
+    results.put((member, result))
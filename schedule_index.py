@@ -0,0 +1,103 @@
+"""
+Incrementally maintained index of the schedule held by a search node.
+
+A search node's schedule is an OperatorNode chain (see williamju_scheduler). Instead of bucketing the whole chain
+by term on every iteration, one ScheduleIndex follows the node currently being expanded. Moving to another node
+reverts the placements down to the common ancestor of the two chains and applies the target's placements on top,
+which for depth-first search is usually a single placement. The index answers, per node:
+    hours       - scheduled credit hours per term (index 0 is term number 1)
+    placements  - course id -> its Placement
+    dependents  - prereq course id -> {term number: [plain dependents, higher requirement dependents]}
+    key         - set hash of the placements, see transposition_table
+"""
+
+from transposition_table import KEY_MASK, placement_key
+
+
+class ScheduleIndex:
+    def __init__(self, catalog, number_of_terms):
+        """
+        :param catalog: interned catalog the placements refer to
+        :param number_of_terms: number of terms in a schedule
+        """
+        self.catalog = catalog
+        self.hours = [0] * number_of_terms
+        self.placements = {}
+        self.dependents = {}
+        self.key = 0
+        self.node = None
+        # applied (OperatorNode, superseded Placement or None) pairs, root first, and the position of each node
+        self._path = []
+        self._positions = {}
+
+    def seek(self, operators):
+        """
+        Makes the index describe the schedule of another search node.
+        :param operators: OperatorNode of the node's newest operator, or None for the empty schedule
+        """
+        if operators is self.node:
+            return
+        pending = []
+        node = operators
+        keep = 0
+        while node is not None:
+            position = self._positions.get(id(node))
+            if position is not None:
+                keep = position + 1
+                break
+            pending.append(node)
+            node = node.parent
+        while len(self._path) > keep:
+            self._revert()
+        for node in reversed(pending):
+            self._apply(node)
+        self.node = operators
+
+    def term_of(self, course):
+        """Returns the term number a course is placed in, or None if it is not scheduled."""
+        placement = self.placements.get(course)
+        return placement.term if placement else None
+
+    def _apply(self, node):
+        placement = node.placement
+        # a newer placement of the same course supersedes the older one
+        superseded = self.placements.get(placement.course)
+        if superseded:
+            self._remove(superseded)
+        self._add(placement)
+        self._positions[id(node)] = len(self._path)
+        self._path.append((node, superseded))
+
+    def _revert(self):
+        node, superseded = self._path.pop()
+        del self._positions[id(node)]
+        self._remove(node.placement)
+        if superseded:
+            self._add(superseded)
+
+    def _add(self, placement):
+        catalog = self.catalog
+        self.placements[placement.course] = placement
+        self.hours[placement.term - 1] += catalog.credits[placement.course]
+        self.key = (self.key + placement_key(placement)) & KEY_MASK
+        if placement.disjunct >= 0:
+            higher = catalog.higher[placement.course]
+            for prereq in catalog.prereqs(placement.disjunct):
+                counts = self.dependents.setdefault(prereq, {}).setdefault(placement.term, [0, 0])
+                counts[higher] += 1
+
+    def _remove(self, placement):
+        catalog = self.catalog
+        del self.placements[placement.course]
+        self.hours[placement.term - 1] -= catalog.credits[placement.course]
+        self.key = (self.key - placement_key(placement)) & KEY_MASK
+        if placement.disjunct >= 0:
+            higher = catalog.higher[placement.course]
+            for prereq in catalog.prereqs(placement.disjunct):
+                dependent_terms = self.dependents[prereq]
+                counts = dependent_terms[placement.term]
+                counts[higher] -= 1
+                if not counts[0] and not counts[1]:
+                    del dependent_terms[placement.term]
+                    if not dependent_terms:
+                        del self.dependents[prereq]
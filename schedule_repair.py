@@ -0,0 +1,173 @@
+"""
+Incremental repair of a schedule after its request changed.
+
+When a student adds or drops a goal, completes courses or finishes a semester, most of the previous solution is
+still valid. repair_schedule keeps the placements of the previous solution that the remaining goals still need
+(through the prereq disjunct each placement was scheduled with) and searches only for the goals that have no
+placement yet, on top of the kept ones. Placements in locked terms are fixed: they are kept as they are, count as
+fulfilled, and nothing new is placed in those terms. Only when the new goals do not fit around the kept placements
+is the whole schedule searched again (still around the locked terms).
+"""
+
+from interned_catalog import UNREACHABLE, intern_catalog
+from williamju_scheduler import (MAX_NUMBER_OF_TERMS, SEARCH_ENGINES, TERMS, OperatorNode, Placement, SearchContext,
+                                 SearchResult, best_first_search, completed_operators, depth_first_search,
+                                 finish_schedule, first_offered_term, generate_course_list, generate_operator_stack,
+                                 generate_scheduler_output, push_state, relax_earliest_terms, state_init)
+
+# (semester name, year name) of the scheduler output -> term number
+TERM_NUMBERS = {(term.semester.name, term.year.name): term_no for term_no, term in enumerate(TERMS) if term}
+
+
+def repair_schedule(course_descriptions, prior_schedule, goal_conditions, initial_state, added_goals=(),
+                    removed_goals=(), completed=(), locked_terms=0, engine='dfs', weight=1.0, time_limit=None,
+                    node_limit=None, cancel=None, stats=None):
+    """
+    Re-plans a schedule after a change of its request, keeping the still needed placements of the prior solution.
+    :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+    (or an InternedCatalog built from it)
+    :param prior_schedule: solution dictionary of course_scheduler (or an earlier repair) for the prior request
+    :param goal_conditions: goal conditions of the prior request
+    :param initial_state: initial state of the prior request
+    :param added_goals: courses newly required
+    :param removed_goals: goals no longer required
+    :param completed: courses fulfilled since the prior request (e.g. transfer credit), treated like the initial state
+    :param locked_terms: number of leading terms (semesters finished or under way) whose courses are kept as scheduled
+    :param engine: search engine of the re-plan, see course_scheduler
+    :param weight: weight of the cost to go estimate for the best_first engine
+    :param time_limit: wall clock budget in seconds, None for no limit
+    :param node_limit: budget of expanded nodes, None for no limit
+    :param cancel: object with an is_set() method polled for cooperative cancellation, or None
+    :param stats: SearchStats of the re-plan, or None
+    :return: SearchResult of the repaired schedule; nodes_expanded counts the nodes of the re-plan only
+    """
+    if engine not in SEARCH_ENGINES:
+        raise ValueError('engine must be one of %s' % (SEARCH_ENGINES,))
+    if not 0 <= locked_terms <= MAX_NUMBER_OF_TERMS:
+        raise ValueError('locked_terms must be between 0 and %d' % MAX_NUMBER_OF_TERMS)
+    catalog = intern_catalog(course_descriptions)
+    placements = prior_placements(catalog, prior_schedule)
+    locked = [placement for placement in placements.values() if placement.term <= locked_terms]
+    fulfilled = catalog.intern_all(initial_state) | catalog.intern_all(completed)
+    fulfilled |= {placement.course for placement in locked}
+    removed = set(tuple(course) for course in removed_goals)
+    goals = [tuple(goal) for goal in goal_conditions if tuple(goal) not in removed]
+    goals += [tuple(goal) for goal in added_goals if tuple(goal) not in goals]
+    goal_ids = [catalog.intern(goal) for goal in goals]
+    goal_ids = [goal for goal in goal_ids if goal not in fulfilled]
+    kept, new_goals = needed_placements(catalog, placements, goal_ids, fulfilled)
+
+    context = SearchContext(catalog, fulfilled, time_limit=time_limit, node_limit=node_limit, cancel=cancel,
+                            stats=stats, propagate=True, backjump=True)
+    if locked_terms:
+        # nothing new goes into a locked term; the bounds of every plan below, the full re-plan included, are
+        # rebuilt from the first unlocked term
+        context.earliest_terms = locked_earliest_terms(catalog, fulfilled, locked_terms)
+    operators = None
+    for placement in sorted(kept, key=lambda placement: (placement.term, placement.course)):
+        operators = OperatorNode(placement, operators)
+    if stats is not None:
+        stats.start_phase('search')
+    if new_goals:
+        # the new goals are placed by scheduled_term like any other course, so they fit around the kept placements
+        tuple_stack = [(push_state(None, tuple(reversed(new_goals))), operators)]
+        operators = _search(context, tuple_stack, engine, weight)
+        if operators is None and kept and context.stopped is None:
+            # the new goals do not fit around the kept placements: plan every goal again
+            operators = _search(context, state_init(catalog, goal_ids, context.earliest_terms), engine, weight)
+    if operators is not None or not new_goals:
+        context.schedule_index.seek(operators)
+        schedule_hours = context.schedule_index.hours.copy()
+        # locked terms are kept exactly as they were, fillers included, so fill_terms leaves them alone
+        for term_no in range(locked_terms):
+            schedule_hours[term_no] = 0
+        schedule = finish_schedule(catalog, schedule_hours, generate_operator_stack(operators) + locked, stats)
+        return SearchResult('solved', True, schedule, schedule, [], context.nodes_expanded)
+    partial_operator_stack = completed_operators(catalog, fulfilled, context.best_operators) + locked
+    scheduled = set(generate_course_list(partial_operator_stack)) | fulfilled
+    remaining_goals = [catalog.courses[goal] for goal in goal_ids if goal not in scheduled]
+    if stats is not None:
+        stats.start_phase(None)
+    return SearchResult(context.stopped or 'infeasible', context.stopped is None, {},
+                        generate_scheduler_output(catalog, partial_operator_stack), remaining_goals,
+                        context.nodes_expanded)
+
+
+def prior_placements(catalog, prior_schedule):
+    """
+    Recovers the placements of a solution dictionary: the term from the CourseInfo's terms and the prereq
+    disjunct from its prereqs (-1 for none, as for filler courses).
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param prior_schedule: solution dictionary of course_scheduler
+    :return: dictionary of course id -> Placement
+    """
+    placements = {}
+    for course, course_info in prior_schedule.items():
+        course_id = catalog.intern(course)
+        term_no = TERM_NUMBERS.get(tuple(course_info.terms))
+        if term_no is None:
+            raise ValueError('%s is scheduled in an unknown term %s' % (tuple(course), course_info.terms))
+        disjunct = -1
+        if course_info.prereqs:
+            prereqs = tuple(tuple(prereq) for prereq in course_info.prereqs)
+            disjunct = next((disjunct for disjunct in catalog.disjuncts(course_id)
+                             if catalog.prereq_tuple(course_id, disjunct) == prereqs), None)
+            if disjunct is None:
+                raise ValueError('%s is scheduled with prereqs the catalog does not list' % (tuple(course),))
+        placements[course_id] = Placement(course_id, disjunct, term_no)
+    return placements
+
+
+def needed_placements(catalog, placements, goal_ids, fulfilled):
+    """
+    Walks the prereq chain of every goal through the prior placements' disjuncts. A goal whose chain is placed (or
+    fulfilled) all the way down keeps its placements; any other goal has to be planned again.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param placements: dictionary of course id -> prior Placement, see prior_placements
+    :param goal_ids: course ids of the goals not fulfilled
+    :param fulfilled: set of course ids fulfilled (initial state, completed and locked courses)
+    :return: (placements still needed, goals to plan)
+    """
+    kept = {}
+    new_goals = []
+    for goal in goal_ids:
+        chain = {}
+        pending = [goal]
+        while pending:
+            course = pending.pop()
+            if course in fulfilled or course in chain:
+                continue
+            placement = placements.get(course)
+            if placement is None:
+                break
+            chain[course] = placement
+            if placement.disjunct >= 0:
+                pending.extend(catalog.prereqs(placement.disjunct))
+        else:
+            kept.update(chain)
+            continue
+        new_goals.append(goal)
+    return list(kept.values()), new_goals
+
+
+def locked_earliest_terms(catalog, fulfilled, locked_terms):
+    """
+    Computes the earliest_terms bounds of a schedule whose leading terms are locked: a course that is not fulfilled
+    is never placed before term locked_terms + 1, and its prereq chain staggers the bounds from there as usual.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param fulfilled: set of course ids fulfilled (initial state, completed and locked courses), bound 0
+    :param locked_terms: number of leading locked terms
+    :return: list of earliest term numbers indexed by course id
+    """
+    bounds = [UNREACHABLE if catalog.disjuncts(course) else first_offered_term(catalog, course, locked_terms + 1)
+              for course in range(len(catalog))]
+    for course in fulfilled:
+        bounds[course] = 0
+    lowered = [course for course, bound in enumerate(bounds) if bound != UNREACHABLE]
+    return relax_earliest_terms(catalog, bounds, lowered, locked_terms + 1)
+
+
+def _search(context, tuple_stack, engine, weight):
+    if engine == 'dfs':
+        return depth_first_search(context, tuple_stack)
+    return best_first_search(context, tuple_stack, weight)
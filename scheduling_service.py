@@ -0,0 +1,347 @@
+"""
+Long-running scheduling service.
+
+Loads and interns the catalog once, then answers JSON requests over HTTP (TCP or a Unix socket) from an asyncio
+event loop:
+    python scheduling_service.py --port 8080
+    python scheduling_service.py --unix /tmp/course_scheduler.sock
+    curl -d '{"goals": [["CS", "major"]], "initial": [["CS", "1101"]]}' localhost:8080/schedule
+POST /schedule takes goals and initial as lists of [program, designation] pairs, an optional deadline in seconds
+(capped at --max-deadline) and optional engine and weight (at least 0); a malformed request is answered with 400.
+GET /health reports the catalog size and the load.
+Searches are CPU bound, so they run on a process pool whose workers inherit the warm catalog. At most --max-pending
+requests are admitted at a time; beyond that requests are shed right away with 503 and a Retry-After header, so a
+burst cannot build up a queue the deadlines would expire in anyway. Each search gets the time left of its deadline
+as time_limit and stops on its own; a request still waiting for a worker when its deadline passes is answered with
+504 and its search is skipped. With --watch the workbook is checked for edits every given number of seconds and
+an edited catalog is swapped in without a restart (see catalog_watcher): searches already running finish on the
+old catalog, new ones start on fresh workers. Any other failure of a request (a search raising in its worker, a
+worker killed) is logged and answered with 500; a pool broken by a dead worker is replaced for later requests.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import math
+import multiprocessing
+import sys
+import time
+
+import course_dictionary
+import williamju_scheduler
+from batch_scheduler import prepare_catalog
+from catalog_watcher import CatalogWatcher
+
+DEFAULT_DEADLINE = 30.0
+MAX_DEADLINE = 300.0
+MAX_PENDING = 64
+MAX_BODY_BYTES = 1 << 20
+# seconds a search may overrun its deadline (it polls the clock every BUDGET_CHECK_INTERVAL nodes) before the
+# request is answered with 504 anyway
+DEADLINE_GRACE_PERIOD = 1.0
+RETRY_AFTER_SECONDS = 1
+SEARCH_OPTIONS = ('engine', 'weight')
+
+logger = logging.getLogger(__name__)
+STATUS_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                  413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+                  504: 'Gateway Timeout'}
+
+# catalog of a worker process, set by the pool initializer
+_catalog = None
+
+
+class RequestError(Exception):
+    """A request the service rejects, carrying the HTTP status to answer with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class SchedulingService:
+    def __init__(self, course_descriptions, processes=None, max_pending=MAX_PENDING, max_deadline=MAX_DEADLINE):
+        """
+        :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+        (or an InternedCatalog built from it)
+        :param processes: number of worker processes, the number of CPUs by default
+        :param max_pending: number of requests admitted at once (searching or waiting for a worker)
+        :param max_deadline: cap on the deadline of a request in seconds
+        """
+        self.catalog = prepare_catalog(course_descriptions)
+        self.max_pending = max_pending
+        self.max_deadline = max_deadline
+        self.pending = 0
+        self.served = 0
+        self.shed = 0
+        self.expired = 0
+        self.reloads = 0
+        self.processes = processes
+        self.executor = self.start_executor()
+
+    def start_executor(self):
+        """Starts a worker pool for the current catalog; forked workers inherit it instead of unpickling it."""
+        start_methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in start_methods else None)
+        return concurrent.futures.ProcessPoolExecutor(self.processes, context, _init_worker, (self.catalog,))
+
+    def reload(self, catalog):
+        """
+        Switches to a new version of the catalog. Searches already submitted finish on the old workers, which shut
+        down afterwards; new requests go to a fresh pool.
+        :param catalog: InternedCatalog of the new version
+        """
+        old_executor = self.executor
+        self.catalog = prepare_catalog(catalog)
+        self.executor = self.start_executor()
+        old_executor.shutdown(wait=False)
+        self.reloads += 1
+
+    def close(self):
+        """Shuts the worker processes down, cancelling searches not started yet."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def health(self):
+        """Returns the service's state as a JSON-ready dictionary."""
+        return {'status': 'ok', 'courses': self.catalog.catalog_size, 'catalog': self.catalog.fingerprint(),
+                'pending': self.pending, 'max_pending': self.max_pending, 'served': self.served,
+                'shed': self.shed, 'expired': self.expired, 'reloads': self.reloads}
+
+    async def schedule(self, request):
+        """
+        Runs one scheduling request on the worker pool.
+        :param request: decoded JSON object of the request
+        :return: JSON-ready dictionary of the SearchResult
+        """
+        goals, initial, deadline, options = self.parse_request(request)
+        if self.pending >= self.max_pending:
+            self.shed += 1
+            raise RequestError(503, 'too many pending requests')
+        self.pending += 1
+        try:
+            expires = time.time() + deadline
+            loop = asyncio.get_running_loop()
+            executor = self.executor
+            try:
+                future = loop.run_in_executor(executor, _schedule_request, goals, initial, expires, options)
+                result, seconds = await asyncio.wait_for(future, deadline + DEADLINE_GRACE_PERIOD)
+            except asyncio.TimeoutError:
+                result = None
+            except concurrent.futures.BrokenExecutor:
+                # a worker died (e.g. killed for memory); this request fails, later ones get a fresh pool
+                if self.executor is executor:
+                    self.executor = self.start_executor()
+                    executor.shutdown(wait=False)
+                raise
+            if result is None:
+                self.expired += 1
+                raise RequestError(504, 'deadline of %g seconds passed' % deadline)
+        finally:
+            self.pending -= 1
+        self.served += 1
+        return result_json(result, seconds)
+
+    def parse_request(self, request):
+        """
+        Validates a scheduling request.
+        :param request: decoded JSON object of the request
+        :return: (goal courses, initial courses, deadline in seconds, search_schedule keyword arguments)
+        """
+        if not isinstance(request, dict):
+            raise RequestError(400, 'request must be a JSON object')
+        goals = parse_courses(request.get('goals', []), 'goals')
+        initial = parse_courses(request.get('initial', []), 'initial')
+        unknown = [course for course in goals if course not in self.catalog.ids
+                   or self.catalog.descriptions[self.catalog.ids[course]] is None]
+        if unknown:
+            raise RequestError(400, 'unknown goal courses: %s' % ', '.join(' '.join(course) for course in unknown))
+        deadline = request.get('deadline', DEFAULT_DEADLINE)
+        if not is_finite_number(deadline) or deadline <= 0:
+            raise RequestError(400, 'deadline must be a positive number of seconds')
+        options = {name: request[name] for name in SEARCH_OPTIONS if name in request}
+        if options.get('engine', 'dfs') not in williamju_scheduler.SEARCH_ENGINES:
+            raise RequestError(400, 'engine must be one of %s' % ', '.join(williamju_scheduler.SEARCH_ENGINES))
+        # a negative weight turns the cost to go into a reward and the search never settles
+        weight = options.get('weight', 1.0)
+        if not is_finite_number(weight) or weight < 0:
+            raise RequestError(400, 'weight must be a non-negative number')
+        return goals, initial, min(deadline, self.max_deadline), options
+
+    async def handle_connection(self, reader, writer):
+        """Answers one HTTP request per connection."""
+        try:
+            try:
+                method, path, body = await read_request(reader)
+                if path == '/health':
+                    if method != 'GET':
+                        raise RequestError(405, 'use GET')
+                    status, response = 200, self.health()
+                elif path == '/schedule':
+                    if method != 'POST':
+                        raise RequestError(405, 'use POST')
+                    try:
+                        request = json.loads(body or b'{}')
+                    except ValueError:
+                        raise RequestError(400, 'body is not valid JSON')
+                    status, response = 200, await self.schedule(request)
+                else:
+                    raise RequestError(404, 'no such endpoint')
+            except RequestError as error:
+                status, response = error.status, {'error': str(error)}
+            except (ConnectionError, asyncio.IncompleteReadError):
+                raise
+            except Exception as error:
+                # e.g. BrokenProcessPool after a worker died, or an exception raised by the search in the worker
+                logger.exception('request failed')
+                status, response = 500, {'error': '%s: %s' % (type(error).__name__, error)}
+            await write_response(writer, status, response)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def is_finite_number(value):
+    """Checks for a JSON number other than NaN and the infinities; true and false are not numbers here."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def parse_courses(courses, name):
+    """Converts a JSON list of [program, designation] pairs into a list of course tuples."""
+    if not isinstance(courses, list) or not all(isinstance(course, list) and len(course) == 2
+                                                and all(isinstance(part, str) for part in course)
+                                                for course in courses):
+        raise RequestError(400, '%s must be a list of [program, designation] pairs' % name)
+    return [tuple(course) for course in courses]
+
+
+def result_json(result, seconds):
+    """Converts a SearchResult into a JSON-ready dictionary; schedules become lists in the scheduler's order."""
+    def schedule_json(schedule):
+        return [{'program': course[0], 'designation': course[1], 'credits': course_info.credits,
+                 'term': list(course_info.terms), 'prereqs': [list(prereq) for prereq in course_info.prereqs]}
+                for course, course_info in schedule.items()]
+
+    return {'status': result.status, 'complete': result.complete, 'schedule': schedule_json(result.schedule),
+            'partial_schedule': schedule_json(result.partial_schedule),
+            'remaining_goals': [list(course) for course in result.remaining_goals],
+            'nodes_expanded': result.nodes_expanded, 'seconds': seconds}
+
+
+async def read_request(reader):
+    """
+    Reads an HTTP request.
+    :param reader: asyncio StreamReader of the connection
+    :return: (method, path without query string, body bytes)
+    """
+    request_line = (await reader.readline()).decode('latin-1').split()
+    if len(request_line) != 3:
+        raise RequestError(400, 'malformed request line')
+    method, target, _ = request_line
+    content_length = 0
+    while True:
+        line = (await reader.readline()).decode('latin-1')
+        if line in ('\r\n', '\n', ''):
+            break
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            try:
+                content_length = int(value)
+            except ValueError:
+                raise RequestError(400, 'malformed Content-Length')
+    if content_length > MAX_BODY_BYTES:
+        raise RequestError(413, 'body larger than %d bytes' % MAX_BODY_BYTES)
+    body = await reader.readexactly(content_length) if content_length > 0 else b''
+    return method, target.split('?', 1)[0], body
+
+
+async def write_response(writer, status, response):
+    """Writes a JSON response and flushes it."""
+    body = json.dumps(response).encode()
+    headers = ['HTTP/1.1 %d %s' % (status, STATUS_REASONS[status]), 'Content-Type: application/json',
+               'Content-Length: %d' % len(body), 'Connection: close']
+    if status == 503:
+        headers.append('Retry-After: %d' % RETRY_AFTER_SECONDS)
+    writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+
+def _init_worker(catalog):
+    global _catalog
+    _catalog = catalog
+
+
+def _schedule_request(goals, initial, expires, options):
+    # a request that waited for a worker past its deadline is not searched at all
+    time_limit = expires - time.time()
+    if time_limit <= 0:
+        return None, 0.0
+    start = time.perf_counter()
+    result = williamju_scheduler.search_schedule(_catalog, goals, initial, time_limit=time_limit, **options)
+    return result, time.perf_counter() - start
+
+
+async def watch_catalog(service, watcher):
+    """Checks the catalog workbook every poll interval and swaps an edited catalog into the service."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(watcher.poll_interval)
+        try:
+            # loading the workbook blocks, so it runs off the event loop
+            diff = await loop.run_in_executor(None, watcher.check)
+        except Exception:
+            # e.g. a workbook caught half written; the next check retries
+            continue
+        if diff is not None:
+            service.reload(watcher.catalog)
+
+
+async def serve(service, host=None, port=None, unix_path=None, watcher=None):
+    """
+    Serves requests until cancelled.
+    :param service: SchedulingService answering the requests
+    :param host: interface to listen on for TCP
+    :param port: TCP port, used when unix_path is None
+    :param unix_path: path of a Unix socket to listen on instead of TCP
+    :param watcher: CatalogWatcher of the service's catalog to reload edits from, or None
+    """
+    if unix_path is not None:
+        server = await asyncio.start_unix_server(service.handle_connection, unix_path)
+    else:
+        server = await asyncio.start_server(service.handle_connection, host, port)
+    watch = asyncio.create_task(watch_catalog(service, watcher)) if watcher is not None else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if watch is not None:
+            watch.cancel()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Serves course schedules over HTTP.')
+    parser.add_argument('--catalog', default=course_dictionary.CATALOG_PATH, help='catalog workbook')
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='TCP port to listen on')
+    parser.add_argument('--unix', help='path of a Unix socket to listen on instead of TCP')
+    parser.add_argument('--processes', type=int, help='worker processes (default: number of CPUs)')
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING, help='requests admitted at once')
+    parser.add_argument('--max-deadline', type=float, default=MAX_DEADLINE, help='cap on request deadlines')
+    parser.add_argument('--watch', type=float, default=0, help='seconds between checks for catalog edits (0: never)')
+    args = parser.parse_args(argv[1:])
+
+    watcher = CatalogWatcher(args.catalog, poll_interval=args.watch) if args.watch > 0 else None
+    course_descriptions = watcher.catalog if watcher else course_dictionary.create_course_dict(args.catalog)
+    service = SchedulingService(course_descriptions, args.processes, args.max_pending, args.max_deadline)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix, watcher))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
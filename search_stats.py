@@ -0,0 +1,73 @@
+"""
+Opt-in statistics of one scheduler search.
+
+A SearchStats handed to williamju_scheduler.search_schedule is filled while the search runs; without one the search
+only pays for a None check per node. The counters are:
+    nodes_popped        - tuples taken off the tuple stack (or best first frontier)
+    nodes_expanded      - popped nodes whose top course was scheduled or rejected
+    backtracks          - expansions that produced no child, so the search falls back to an earlier option
+    rejections          - scheduled_term rejections by cause, see REJECTION_CAUSES
+    transposition_hits  - nodes skipped because the same state was expanded before
+    propagation_cutoffs - nodes cut off because a pushed prereq has no term left, see consistent_child
+    backjumped          - waiting tuples skipped by conflict-directed backjumping
+    nogood_cutoffs      - nodes cut off because a course in their state matches a recorded nogood
+    fill_iterations     - filler course picks attempted by fill_terms
+    max_stack_depth     - largest number of tuples waiting on the tuple stack (or frontier)
+    phase_seconds       - wall time of the state_init, search, fill and output phases
+An on_expand callback receives every expansion as an Expansion, e.g. to feed an external metrics pipeline.
+"""
+
+import time
+from collections import namedtuple
+
+# why scheduled_term found no term for a course:
+#   unreachable  - the course's prereq chain cannot be completed within the schedule at all
+#   prereq_order - a dependent scheduled in the first term(s) leaves no earlier term
+#   offering     - no term between the earliest and the latest allowed one offers the course
+#   credit_cap   - the terms offering the course are full
+REJECTION_CAUSES = ('unreachable', 'prereq_order', 'offering', 'credit_cap')
+PHASES = ('state_init', 'search', 'fill', 'output')
+
+# one expansion: the course key, the term it was placed in (None when rejected or skipped), the number of children
+# pushed and the number of tuples waiting in the search afterwards
+Expansion = namedtuple('Expansion', 'course, term, children, stack_depth')
+
+
+class SearchStats:
+    def __init__(self, on_expand=None):
+        """
+        :param on_expand: callable receiving an Expansion per expanded node, or None
+        """
+        self.on_expand = on_expand
+        self.nodes_popped = 0
+        self.nodes_expanded = 0
+        self.backtracks = 0
+        self.rejections = dict.fromkeys(REJECTION_CAUSES, 0)
+        self.transposition_hits = 0
+        self.propagation_cutoffs = 0
+        self.backjumped = 0
+        self.nogood_cutoffs = 0
+        self.fill_iterations = 0
+        self.max_stack_depth = 0
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self._phase = None
+        self._phase_start = None
+
+    def start_phase(self, phase):
+        """Ends the running phase, if any, and starts timing the next one (None to just end it)."""
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.phase_seconds[self._phase] += now - self._phase_start
+        self._phase, self._phase_start = phase, now
+
+    def as_dict(self):
+        """Returns the counters as a plain dictionary, e.g. for JSON output."""
+        return {'nodes_popped': self.nodes_popped, 'nodes_expanded': self.nodes_expanded,
+                'backtracks': self.backtracks, 'rejections': dict(self.rejections),
+                'transposition_hits': self.transposition_hits, 'propagation_cutoffs': self.propagation_cutoffs,
+                'backjumped': self.backjumped, 'nogood_cutoffs': self.nogood_cutoffs,
+                'fill_iterations': self.fill_iterations,
+                'max_stack_depth': self.max_stack_depth, 'phase_seconds': dict(self.phase_seconds)}
+
+    def __repr__(self):
+        return 'SearchStats(%s)' % ', '.join('%s=%r' % item for item in self.as_dict().items())
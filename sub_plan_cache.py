@@ -0,0 +1,125 @@
+"""
+Cross-request cache of requirement sub-plans.
+
+Requests often share big requirement courses such as ('CS', 'core') or ('CS', 'mathematics'). A sub-plan is the
+schedule the search finds for one such requirement on its own: the requirement and its prereq chains as
+(course, disjunct, offset) entries, with the offset in terms relative to the requirement's own term (the anchor).
+It depends only on the requirement, the initial state courses inside the requirement's prereq closure and the
+catalog, which together form the cache key, so it can be reused by every request with the same slice of initial
+state. Entries are evicted least recently used first once the entry cap or the (estimated) memory cap is reached.
+"""
+
+import sys
+from collections import OrderedDict, namedtuple
+
+# placements of a requirement solved on its own; anchor is the requirement's term, offsets are relative to it
+SubPlan = namedtuple('SubPlan', 'anchor, placements')
+SubPlanKey = namedtuple('SubPlanKey', 'requirement, initial_slice, catalog_version')
+
+SUB_PLAN_CACHE_ENTRIES = 1024
+SUB_PLAN_CACHE_BYTES = 16 * 1024 * 1024
+
+
+def sub_plan_key(catalog, requirement, initial_ids):
+    """
+    Builds the cache key of a requirement for a request.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param requirement: course id of the requirement
+    :param initial_ids: set of course ids of the request's initial state
+    :return: SubPlanKey of the requirement, the initial courses in its prereq closure and the catalog fingerprint
+    """
+    closure = catalog.closure_masks()[requirement]
+    initial_slice = frozenset(catalog.courses[course] for course in initial_ids if closure >> course & 1)
+    return SubPlanKey(catalog.courses[requirement], initial_slice, catalog.fingerprint())
+
+
+def sub_plan_size(key, sub_plan):
+    """Estimates the memory held by a cache entry in bytes."""
+    size = sys.getsizeof(key) + sys.getsizeof(key.initial_slice) + sys.getsizeof(sub_plan)
+    size += sys.getsizeof(sub_plan.placements) + sum(sys.getsizeof(entry) for entry in sub_plan.placements)
+    return size
+
+
+class SubPlanCache:
+    def __init__(self, max_entries=SUB_PLAN_CACHE_ENTRIES, max_bytes=SUB_PLAN_CACHE_BYTES):
+        """
+        :param max_entries: cap on the number of cached sub-plans
+        :param max_bytes: cap on the estimated memory of the cached sub-plans
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+        # key -> (SubPlan or None for a requirement without a sub-plan, estimated size)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """
+        Looks a requirement up and marks it as recently used.
+        :param key: SubPlanKey
+        :return: (True, SubPlan or None) when cached, (False, None) otherwise
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[0]
+
+    def put(self, key, sub_plan):
+        """
+        Stores the sub-plan of a requirement, None for a requirement found to have none, evicting least recently
+        used entries while a cap is exceeded. An entry larger than max_bytes by itself is not stored.
+        :param key: SubPlanKey
+        :param sub_plan: SubPlan or None
+        """
+        self.discard(key)
+        size = sub_plan_size(key, sub_plan) if sub_plan is not None else sys.getsizeof(key)
+        if size > self.max_bytes or not self.max_entries:
+            return
+        self._entries[key] = sub_plan, size
+        self.size_bytes += size
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.size_bytes -= evicted_size
+            self.evictions += 1
+
+    def discard(self, key):
+        """Removes a requirement's entry if there is one."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
+
+    def migrate(self, old_version, new_version, affected):
+        """
+        Carries the entries of one catalog version over to the next after an edit of the catalog: entries whose
+        requirement is affected by the edit are dropped, the others are kept under the new version. Entries of
+        other versions are left alone.
+        :param old_version: fingerprint of the catalog before the edit
+        :param new_version: fingerprint of the catalog after the edit
+        :param affected: callable telling whether the sub-plan of a requirement course may have changed
+        :return: number of entries dropped
+        """
+        dropped = 0
+        for key in [key for key in self._entries if key.catalog_version == old_version]:
+            sub_plan, size = self._entries.pop(key)
+            if affected(key.requirement):
+                self.size_bytes -= size
+                dropped += 1
+            else:
+                self._entries[key._replace(catalog_version=new_version)] = sub_plan, size
+        return dropped
+
+    def clear(self):
+        """Removes every entry."""
+        self._entries.clear()
+        self.size_bytes = 0
@@ -0,0 +1,121 @@
+"""
+Batched evaluation of term placements and filler feasibility.
+
+The search places one course at a time, and apply_constraints checks every term of that course at once with
+integer bitmasks, which a NumPy call cannot beat per course. Callers that need the answer for many courses
+against one schedule (advising tools listing where every course could still go, what-if views of a schedule,
+diagnostics) would otherwise loop over apply_constraints or fill_terms. This module answers them in one batched
+operation over a courses x terms availability matrix and a per term credit vector, built once per catalog. Without
+NumPy the same functions fall back to the scalar code of williamju_scheduler and return the same values.
+"""
+
+import heapq
+from collections import namedtuple
+
+from williamju_scheduler import (MAX_NUMBER_OF_TERMS, NUMBER_OF_SEMESTERS, apply_constraints, filler_index,
+                                 offered_terms, term_capacity)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# offered: bool courses x terms, credits: per course, prereq_free: bool per course, capacity: per term
+TermMatrix = namedtuple('TermMatrix', 'offered, credits, prereq_free, capacity')
+
+
+def term_matrix(catalog):
+    """
+    Availability matrix of a catalog: column term_no - 1 of row c tells whether course c is offered in term term_no.
+    Built once per catalog.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :return: TermMatrix of NumPy arrays, or None without NumPy
+    """
+    if numpy is None:
+        return None
+    matrix = catalog.derived.get('term_matrix')
+    if matrix is None:
+        masks = numpy.array(offered_terms(catalog), dtype=numpy.int64)
+        offered = (masks[:, None] >> numpy.arange(MAX_NUMBER_OF_TERMS)) & 1 == 1
+        credits = numpy.array(catalog.credits, dtype=numpy.int64)
+        prereq_free = numpy.array([not catalog.disjuncts(course) for course in range(len(catalog))])
+        capacity = numpy.array([term_capacity(term_no) for term_no in range(1, MAX_NUMBER_OF_TERMS + 1)])
+        matrix = catalog.derived['term_matrix'] = TermMatrix(offered, credits, prereq_free, capacity)
+    return matrix
+
+
+def placement_terms(catalog, courses, schedule_hours, latest_term=MAX_NUMBER_OF_TERMS, lowest_term=1):
+    """
+    Finds for every course the term apply_constraints would place it in: the latest term between lowest_term and
+    latest_term that offers the course and has room for its credit hours.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param courses: sequence of course ids
+    :param schedule_hours: list of integers holding currently scheduled credit hours of each term
+    :param latest_term: latest term number allowed, for all courses or a sequence with one per course
+    :param lowest_term: earliest term number allowed, for all courses or a sequence with one per course
+    :return: list of term numbers, 0 for a course that fits nowhere
+    """
+    matrix = term_matrix(catalog)
+    if matrix is None:
+        latest_terms = latest_term if hasattr(latest_term, '__len__') else [latest_term] * len(courses)
+        lowest_terms = lowest_term if hasattr(lowest_term, '__len__') else [lowest_term] * len(courses)
+        return [apply_constraints(catalog, course, schedule_hours, latest - 1, lowest) or 0
+                for course, latest, lowest in zip(courses, latest_terms, lowest_terms)]
+    courses = numpy.asarray(courses, dtype=numpy.int64)
+    hours = numpy.asarray(schedule_hours[:MAX_NUMBER_OF_TERMS])
+    term_numbers = numpy.arange(1, MAX_NUMBER_OF_TERMS + 1)
+    window = (term_numbers >= numpy.reshape(lowest_term, (-1, 1))) & \
+             (term_numbers <= numpy.reshape(latest_term, (-1, 1)))
+    fits = matrix.offered[courses] & window & \
+        (hours + matrix.credits[courses][:, None] <= matrix.capacity)
+    # highest fitting term: the first hit scanning the columns backwards
+    latest = MAX_NUMBER_OF_TERMS - numpy.argmax(fits[:, ::-1], axis=1)
+    return numpy.where(fits.any(axis=1), latest, 0).tolist()
+
+
+def filler_candidates(catalog, schedule_hours, scheduled=()):
+    """
+    Lists for every term the courses fill_terms could add to it: the prereq-free courses offered in the term, not
+    scheduled yet and fitting under the term's credit hour maximum, in catalog order.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param schedule_hours: list of integers holding currently scheduled credit hours of each term
+    :param scheduled: course ids already in the schedule
+    :return: list with a list of course ids per term
+    """
+    matrix = term_matrix(catalog)
+    if matrix is None:
+        scheduled = set(scheduled)
+        return [[course for course in heapq.merge(*fitting_buckets(catalog, idx, hours)) if course not in scheduled]
+                for idx, hours in enumerate(schedule_hours)]
+    hours = numpy.asarray(schedule_hours)
+    available = matrix.prereq_free.copy()
+    available[list(scheduled)] = False
+    fits = matrix.offered[:, :len(hours)] & available[:, None] & \
+        (matrix.credits[:, None] + hours <= matrix.capacity[:len(hours)])
+    return [numpy.flatnonzero(column).tolist() for column in fits.T]
+
+
+def filler_terms(catalog, schedule_hours, scheduled=()):
+    """
+    Finds for every term the course fill_terms would add to it next, the first of its filler_candidates. The
+    filler index only looks at the head of each credit bucket, which is faster than a column of the matrix, so
+    this is never evaluated on the matrix.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param schedule_hours: list of integers holding currently scheduled credit hours of each term
+    :param scheduled: course ids already in the schedule
+    :return: list with a course id per term, None for a term nothing fits in
+    """
+    scheduled = set(scheduled)
+    fillers = []
+    for idx, hours in enumerate(schedule_hours):
+        heads = (next((course for course in courses if course not in scheduled), None)
+                 for courses in fitting_buckets(catalog, idx, hours))
+        fillers.append(min((course for course in heads if course is not None), default=None))
+    return fillers
+
+
+def fitting_buckets(catalog, idx, hours):
+    """Returns the filler index buckets of a term (by index) whose credit value still fits under its maximum."""
+    capacity = term_capacity(idx + 1)
+    return [courses for credits, courses in filler_index(catalog)[idx % NUMBER_OF_SEMESTERS]
+            if hours + credits <= capacity]
@@ -0,0 +1,122 @@
+"""
+Regression tests of conflict-directed backjumping and nogood learning.
+
+Backjumping pops siblings and nogoods cut off nodes without expanding them, so both may only ever skip dead
+branches: on any request the search can run to the end, backjump=True must reach the same verdict and the same
+first schedule as backjump=False.
+    python -m pytest test_backjump.py
+"""
+
+import random
+import unittest
+
+import course_dictionary
+import williamju_scheduler
+from benchmark import DOCUMENTED_CASES
+from williamju_scheduler import Course, CourseInfo
+
+NODE_LIMIT = 200000
+RANDOM_CATALOGS = 60
+# portfolio shares of test_branch_shares
+SHARES = 4
+
+
+def search_both(course_descriptions, goal_conditions, initial_state):
+    """Runs a request with and without backjumping; both runs must finish within NODE_LIMIT."""
+    results = [williamju_scheduler.search_schedule(course_descriptions, goal_conditions, initial_state,
+                                                   node_limit=NODE_LIMIT, backjump=backjump)
+               for backjump in (True, False)]
+    for result in results:
+        assert result.complete, 'the search did not run to the end: %s' % result.status
+    return results
+
+
+def random_catalog(rng, size):
+    """
+    A small random catalog with long prereq chains and heavy courses, so that some requests are infeasible. Course
+    i only takes prereqs among the four courses before it, so there is no cycle.
+    """
+    catalog = {}
+    courses = [Course('X', str(1000 + 100 * idx)) for idx in range(size)]
+    for idx, course in enumerate(courses):
+        terms = rng.choice(['Fall', 'Spring', 'Fall Spring'])
+        prereqs = ()
+        if idx and rng.random() < 0.8:
+            earlier = courses[max(0, idx - 4):idx]
+            prereqs = tuple(tuple(rng.sample(earlier, rng.randint(1, min(2, len(earlier)))))
+                            for _ in range(rng.randint(1, 2)))
+        catalog[course] = CourseInfo(str(rng.choice([3, 6, 9, 10])), tuple(terms.split()), prereqs)
+    return catalog, courses
+
+
+class BackjumpTest(unittest.TestCase):
+    def assert_same_outcome(self, course_descriptions, goal_conditions, initial_state):
+        with_backjump, without_backjump = search_both(course_descriptions, goal_conditions, initial_state)
+        self.assertEqual(with_backjump.status, without_backjump.status)
+        self.assertEqual(with_backjump.schedule, without_backjump.schedule)
+        return with_backjump
+
+    def test_solvable_chain(self):
+        catalog = {Course('X', '1101'): CourseInfo('3', ('Fall', 'Spring'), ()),
+                   Course('X', '2201'): CourseInfo('3', ('Spring',), ((Course('X', '1101'),),)),
+                   Course('X', '3301'): CourseInfo('4', ('Fall',), ((Course('X', '2201'),),))}
+        result = self.assert_same_outcome(catalog, [Course('X', '3301')], [])
+        self.assertEqual(result.status, 'solved')
+
+    def test_infeasible_credit_cap(self):
+        # 10 credit Fall courses behind a shared prereq: two never fit into one 18 credit term and the first Fall
+        # is taken by nothing but the prereq, which leaves room for three of them
+        catalog = {Course('X', '1000'): CourseInfo('3', ('Fall', 'Spring'), ())}
+        goals = []
+        for idx in range(5):
+            goal = Course('X', str(2000 + idx))
+            catalog[goal] = CourseInfo('10', ('Fall',), ((Course('X', '1000'),),))
+            goals.append(goal)
+        self.assertEqual(self.assert_same_outcome(catalog, goals, []).status, 'infeasible')
+        self.assertEqual(self.assert_same_outcome(catalog, goals[:4], []).status, 'infeasible')
+        self.assertEqual(self.assert_same_outcome(catalog, goals[:3], []).status, 'solved')
+
+    def test_random_catalogs(self):
+        rng = random.Random(0)
+        statuses = set()
+        for _ in range(RANDOM_CATALOGS):
+            catalog, courses = random_catalog(rng, rng.randint(8, 14))
+            goals = rng.sample(courses, rng.randint(3, 6))
+            initial = rng.sample([course for course in courses if course not in goals], rng.randint(0, 2))
+            statuses.add(self.assert_same_outcome(catalog, goals, initial).status)
+        # the random requests cover both verdicts
+        self.assertEqual(statuses, {'solved', 'infeasible'})
+
+    def test_branch_shares(self):
+        # the shares split_branches hands to portfolio members together search the unsplit tree: the request is
+        # infeasible exactly when every share is, and otherwise one of the shares finds the unsplit schedule. The
+        # states the split expands are already in the transposition table when the shares search, which can change
+        # the first schedule a share finds, so the schedules are only compared without the table
+        rng = random.Random(3)
+        for _ in range(RANDOM_CATALOGS):
+            catalog, courses = random_catalog(rng, rng.randint(8, 14))
+            goals = rng.sample(courses, rng.randint(3, 6))
+            initial = rng.sample([course for course in courses if course not in goals], rng.randint(0, 2))
+            for table_size in (0, williamju_scheduler.TRANSPOSITION_TABLE_SIZE):
+                unsplit, *shares = [williamju_scheduler.search_schedule(catalog, goals, initial, table_size=table_size,
+                                                                        node_limit=NODE_LIMIT, branch_share=share)
+                                    for share in [None] + [(share, SHARES) for share in range(SHARES)]]
+                for result in [unsplit] + shares:
+                    self.assertTrue(result.complete, result.status)
+                solved = [result.schedule for result in shares if result.status == 'solved']
+                self.assertEqual(unsplit.status == 'solved', bool(solved))
+                if table_size == 0 and solved:
+                    self.assertIn(unsplit.schedule, solved)
+
+    def test_documented_cases(self):
+        course_descriptions = course_dictionary.create_course_dict()
+        for case in DOCUMENTED_CASES:
+            if case.name == 'test 5':
+                # infeasible, but without backjumping the search does not finish
+                continue
+            with self.subTest(case.name):
+                self.assert_same_outcome(course_descriptions, case.goal_conditions, case.initial_state)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Regression tests of schedule_repair.repair_schedule around locked terms.
+    python -m pytest test_schedule_repair.py
+"""
+
+import unittest
+
+import course_dictionary
+import williamju_scheduler
+from interned_catalog import is_higher_requirement
+from schedule_repair import TERM_NUMBERS, repair_schedule
+
+# without the staggered bounds these repairs ran into any budget; with them they take a few thousand nodes at most
+NODE_LIMIT = 20000
+GOALS = [('CS', 'major'), ('CS', '2201')]
+
+
+def term_number(course_info):
+    return TERM_NUMBERS[tuple(course_info.terms)]
+
+
+class LockedTermsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.course_descriptions = course_dictionary.create_course_dict()
+        cls.prior = williamju_scheduler.course_scheduler(cls.course_descriptions, GOALS, [])
+
+    def assert_repaired(self, added_goals, locked_terms):
+        result = repair_schedule(self.course_descriptions, self.prior, GOALS, [], added_goals=added_goals,
+                                 locked_terms=locked_terms, node_limit=NODE_LIMIT)
+        self.assertEqual(result.status, 'solved')
+        schedule = result.schedule
+        for goal in GOALS + added_goals:
+            self.assertIn(goal, schedule)
+        # the locked terms are kept exactly as they were and nothing new goes into them
+        self.assertEqual({course: info for course, info in schedule.items() if term_number(info) <= locked_terms},
+                         {course: info for course, info in self.prior.items() if term_number(info) <= locked_terms})
+        for course, course_info in schedule.items():
+            latest = term_number(course_info) - (0 if is_higher_requirement(course) else 1)
+            for prereq in course_info.prereqs:
+                self.assertLessEqual(term_number(schedule[prereq]), latest, (course, prereq))
+        return result
+
+    def test_added_goals_after_two_locked_terms(self):
+        self.assert_repaired([('JAPN', '2201'), ('CS', '4269')], 2)
+
+    def test_added_goal_after_four_locked_terms(self):
+        self.assert_repaired([('MATH', '3640')], 4)
+
+    def test_no_locked_terms(self):
+        self.assert_repaired([('JAPN', '2201'), ('CS', '4269')], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Tests of the scheduling service's request handler, driven through handle_connection on an in-memory connection.
+    python -m pytest test_scheduling_service.py
+"""
+
+import asyncio
+import json
+import unittest
+
+from scheduling_service import SchedulingService
+from williamju_scheduler import Course, CourseInfo
+
+CATALOG = {Course('X', '1101'): CourseInfo('3', ('Fall', 'Spring'), ()),
+           Course('X', '2201'): CourseInfo('3', ('Spring',), ((Course('X', '1101'),),)),
+           Course('X', '3301'): CourseInfo('4', ('Fall',), ((Course('X', '2201'),),))}
+# seconds a test waits for an answer before failing instead of hanging
+ANSWER_TIMEOUT = 30
+
+
+class MemoryWriter:
+    """The part of an asyncio StreamWriter handle_connection writes the response through."""
+
+    def __init__(self):
+        self.data = b''
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class SchedulingServiceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = SchedulingService(CATALOG, processes=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.close()
+
+    def request(self, method, path, body=None):
+        """Sends one HTTP request through the handler and returns (status, headers, decoded JSON body)."""
+        payload = b'' if body is None else json.dumps(body).encode()
+        request = ('%s %s HTTP/1.1\r\nContent-Length: %d\r\n\r\n' % (method, path, len(payload))).encode() + payload
+
+        async def exchange():
+            reader = asyncio.StreamReader()
+            reader.feed_data(request)
+            reader.feed_eof()
+            writer = MemoryWriter()
+            await asyncio.wait_for(self.service.handle_connection(reader, writer), ANSWER_TIMEOUT)
+            self.assertTrue(writer.closed)
+            return writer.data
+
+        head, _, response_body = asyncio.run(exchange()).partition(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        headers = dict(line.split(': ', 1) for line in header_lines)
+        return int(status_line.split()[1]), headers, json.loads(response_body)
+
+    def test_schedule(self):
+        status, _, response = self.request('POST', '/schedule', {'goals': [['X', '3301']], 'deadline': 10})
+        self.assertEqual(status, 200)
+        self.assertEqual(response['status'], 'solved')
+        scheduled = [[course['program'], course['designation']] for course in response['schedule']]
+        for course in (['X', '1101'], ['X', '2201'], ['X', '3301']):
+            self.assertIn(course, scheduled)
+
+    def test_health(self):
+        status, _, response = self.request('GET', '/health')
+        self.assertEqual(status, 200)
+        self.assertEqual(response['courses'], len(CATALOG))
+
+    def test_bad_requests(self):
+        for body in (['X', '3301'],
+                     {'goals': [['X', '9999']]},
+                     {'goals': 'X 3301'},
+                     {'goals': [['X', '3301']], 'deadline': True},
+                     {'goals': [['X', '3301']], 'deadline': -1},
+                     {'goals': [['X', '3301']], 'engine': 'bfs'},
+                     {'goals': [['X', '3301']], 'engine': 'best_first', 'weight': -5},
+                     {'goals': [['X', '3301']], 'engine': 'best_first', 'weight': True},
+                     {'goals': [['X', '3301']], 'engine': 'best_first', 'weight': '3'}):
+            with self.subTest(body=body):
+                status, _, response = self.request('POST', '/schedule', body)
+                self.assertEqual(status, 400)
+                self.assertIn('error', response)
+
+    def test_non_finite_numbers(self):
+        # Python's json reads and writes NaN and Infinity, so a client sending them gets past the decoder
+        for name, value in (('deadline', float('nan')), ('deadline', float('inf')), ('weight', float('nan')),
+                            ('weight', float('inf'))):
+            with self.subTest(**{name: value}):
+                status, _, _ = self.request('POST', '/schedule', {'goals': [['X', '3301']], name: value})
+                self.assertEqual(status, 400)
+
+    def test_unknown_endpoint_and_method(self):
+        self.assertEqual(self.request('GET', '/nothing')[0], 404)
+        self.assertEqual(self.request('GET', '/schedule')[0], 405)
+
+    def test_shed_when_full(self):
+        max_pending = self.service.max_pending
+        self.service.max_pending = 0
+        try:
+            status, headers, _ = self.request('POST', '/schedule', {'goals': [['X', '3301']]})
+        finally:
+            self.service.max_pending = max_pending
+        self.assertEqual(status, 503)
+        self.assertIn('Retry-After', headers)
+
+    def test_deadline_passed(self):
+        # the deadline passes before the worker picks the request up, so its search is skipped
+        status, _, response = self.request('POST', '/schedule', {'goals': [['X', '3301']], 'deadline': 1e-9})
+        self.assertEqual(status, 504)
+        self.assertIn('error', response)
+
+
+if __name__ == '__main__':
+    unittest.main()
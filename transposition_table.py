@@ -0,0 +1,74 @@
+"""
+Transposition table for the regression planner.
+
+Different disjunct orderings often lead the search to the same remaining goals with the same term placements.
+Such a search state is identified by a 64 bit key: the remaining goals are hashed as a multiset and the schedule
+as a set of (course, disjunct, term) placements, both as sums of per-element hashes so the key can be updated
+incrementally as a course is pushed, popped or placed. Once a state has been expanded, any later state with the same
+key is known to be explored already (or to be an ancestor of the current node) and is skipped.
+"""
+
+from collections import OrderedDict
+
+KEY_MASK = (1 << 64) - 1
+# salts keep goal hashes and placement hashes apart
+GOAL_SALT = 0x5bd1e9955bd1e995
+PLACEMENT_SALT = 0x27d4eb2f165667c5
+EVICTION_POLICIES = ('lru', 'fifo')
+
+
+def zobrist(value):
+    """Mixes a non-negative integer into a well distributed 64 bit hash (splitmix64 finalizer)."""
+    value = (value + 0x9e3779b97f4a7c15) & KEY_MASK
+    value = ((value ^ (value >> 30)) * 0xbf58476d1ce4e5b9) & KEY_MASK
+    value = ((value ^ (value >> 27)) * 0x94d049bb133111eb) & KEY_MASK
+    return value ^ (value >> 31)
+
+
+def goal_key(course):
+    """Returns the hash a remaining goal contributes to a state key."""
+    return zobrist(course ^ GOAL_SALT)
+
+
+def placement_key(placement):
+    """
+    Returns the hash a placement contributes to a schedule key. The chosen prereq disjunct is part of the
+    placement since it decides which courses are constrained to earlier terms.
+    """
+    return zobrist(((((placement.course << 20) | (placement.disjunct + 1)) << 8) | placement.term) ^ PLACEMENT_SALT)
+
+
+class TranspositionTable:
+    def __init__(self, max_entries, eviction='lru'):
+        """
+        :param max_entries: memory cap; once reached, one entry is evicted per insertion
+        :param eviction: 'lru' evicts the entry least recently looked up, 'fifo' the oldest inserted entry
+        """
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError('eviction must be one of %s' % (EVICTION_POLICIES,))
+        self.max_entries = max_entries
+        self.eviction = eviction
+        self.hits = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def visit(self, key):
+        """
+        Records a search state as explored.
+        :param key: state key
+        :return: True if the state was already in the table and should be skipped
+        """
+        if key in self._entries:
+            self.hits += 1
+            if self.eviction == 'lru':
+                self._entries.move_to_end(key)
+            return True
+        self._entries[key] = None
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return False
@@ -124,9 +124,20 @@ Valid plan found: Yes
 Wait time estimate: < 1 seconds
 """
 
+import bisect
+import heapq
+import time
 from collections import namedtuple
 from enum import IntEnum
 
+from interned_catalog import UNREACHABLE, intern_catalog
+# moved to interned_catalog; still importable from here for callers of the original scheduler
+from interned_catalog import is_higher_requirement
+from schedule_index import ScheduleIndex
+from search_stats import Expansion
+from sub_plan_cache import SubPlan, sub_plan_key
+from transposition_table import KEY_MASK, TranspositionTable, goal_key
+
 SUMMER_TERMS = False
 NUMBER_OF_SEMESTERS = 3 if SUMMER_TERMS else 2
 MAX_NUMBER_OF_TERMS = 11 if SUMMER_TERMS else 8
@@ -134,10 +145,40 @@ MAX_CREDITS_PER_NON_SUMMER_TERM = 18
 MIN_CREDITS_PER_NON_SUMMER_TERM = 12
 MAX_CREDITS_PER_SUMMER_TERM = 6
 MIN_CREDITS_PER_SUMMER_TERM = 0
+# default memory cap (entries) and eviction policy of the transposition table, see transposition_table
+TRANSPOSITION_TABLE_SIZE = 100000
+TRANSPOSITION_EVICTION = 'lru'
+SEARCH_ENGINES = ('dfs', 'best_first')
+# expansions between two checks of the wall clock and cancellation budgets
+BUDGET_CHECK_INTERVAL = 256
+# a search split into shares expands its first levels until there are this many top-level branches per share,
+# for at most BRANCH_SPLIT_DEPTH levels
+BRANCH_SPLIT_FACTOR = 4
+BRANCH_SPLIT_DEPTH = 6
+# node budget of the search solving one requirement on its own for the sub-plan cache
+SUB_PLAN_NODE_LIMIT = 20000
+# nogoods kept per rejected course, the most recent ones
+NOGOODS_PER_COURSE = 8
 
 Course = namedtuple('Course', 'program, designation')
 CourseInfo = namedtuple('CourseInfo', 'credits, terms, prereqs')
 Operator = namedtuple('Operator', 'PRE, EFF, ScheduledTerm, credits')
+# interned operator used during the search: course id, disjunct id of PRE (-1 for none) and term number
+Placement = namedtuple('Placement', 'course, disjunct, term')
+# persistent search nodes: a state is the slice courses[start:end] (top course last) stacked on its parent state,
+# with key the multiset hash of every course in it and size the number of courses in it; an operator stack is the
+# newest placement linked to the operators before it
+StateNode = namedtuple('StateNode', 'courses, start, end, parent, key, size')
+OperatorNode = namedtuple('OperatorNode', 'placement, parent')
+# outcome of search_schedule: status is 'solved', 'infeasible', 'time_limit', 'node_limit' or 'cancelled' and
+# complete tells whether the search ran to the end (solved or proven infeasible). partial_schedule holds the
+# placements of the most advanced node whose prereq chains are fully placed, remaining_goals the goals it misses.
+SearchResult = namedtuple('SearchResult', 'status, complete, schedule, partial_schedule, remaining_goals, '
+                                          'nodes_expanded')
+# why scheduled_term rejected a course: (course, term) pairs whose credit hours fill every term the course could use,
+# the placement of a plain dependent bounding those terms from above (None if there is none), and the bitmask of the
+# course and every course involved. Any schedule holding all of these rejects the course as well.
+Nogood = namedtuple('Nogood', 'capacity, bounding, mask')
 
 
 class ScheduledCourse:
@@ -212,132 +253,803 @@ class Term:
         return "(%s, %s)" % (self.semester, self.year)
 
 
-def course_scheduler(course_descriptions, goal_conditions, initial_state):
+# shared Term per term number (index 0 unused), so building the output never constructs Term objects; the
+# instances end up in every returned schedule and must not be modified
+TERMS = (None,) + tuple(Term.initFromTermNo(term_no) for term_no in range(1, MAX_NUMBER_OF_TERMS + 1))
+
+
+def course_scheduler(course_descriptions, goal_conditions, initial_state, engine='dfs', weight=1.0,
+                     table_size=TRANSPOSITION_TABLE_SIZE, eviction=TRANSPOSITION_EVICTION):
     """
     Holds the primary search loop and builds the state and operator stack while searching
     for the goal state that fulfills all goal conditions. Initializes start with state_init,
     finds a valid term for the considered course, then calls fill term function to fulfill
-    minimum credit requirements. Then calls output creation function.
+    minimum credit requirements. Then calls output creation function. The search runs on the
+    interned catalog (course ids, int credits, semester bitmasks); courses are translated back
+    to Course/CourseInfo only when the output is created. States and operator stacks are
+    persistent linked nodes (StateNode, OperatorNode), so a pushed branch shares everything
+    with its parent and only adds its own node. A ScheduleIndex follows the node being
+    expanded and keeps its term hours, placements and dependents up to date incrementally.
+    A state whose remaining goals and schedule were already expanded is skipped (transposition
+    table).
     :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+    (or an InternedCatalog built from it)
     :param goal_conditions: list of courses required in a valid schedule
     :param initial_state: list of courses already fulfilled, not scheduled
+    :param engine: 'dfs' for the heuristic depth first search over the tuple stack, 'best_first' for a
+    (weighted) A* search ordered by operators placed + weight * estimated cost to go
+    :param weight: weight of the cost to go estimate for the best_first engine; above 1 trades optimality for speed
+    :param table_size: memory cap of the transposition table in entries, 0 to disable it
+    :param eviction: eviction policy of the transposition table, 'lru' or 'fifo'
     :return: dictionary of scheduled courses for a solution or empty dictionary
     """
-    tuple_stack = state_init(course_descriptions, goal_conditions, initial_state)
-    final_operator_stack = []
-    top_tuple = tuple_stack[len(tuple_stack) - 1] if len(tuple_stack) != 0 else ()
-    operated_state = []
-    # empty check
-    if top_tuple:
-        # take the first state
-        operated_state = top_tuple[0] if len(top_tuple[0]) != 0 else []
-        final_operator_stack = top_tuple[1]
-    # check if stack of states is empty (tried all options), or complete
-    while operated_state:
-        top_course = operated_state[len(operated_state) - 1]
-        # check if the top course exists in the initial state
-        if not initial_state.count(top_course):
-            operator_schedule = generate_operator_schedule(final_operator_stack)
-            # check if the course has already been scheduled
-            scheduled = in_schedule(operator_schedule, top_course)
-            if scheduled:
-                for operator in final_operator_stack:
-                    if operator.EFF == top_course:
-                        # with the removal of the duplicate course, the insertion action
-                        # will either place it in the same place or a new valid location
-                        final_operator_stack.remove(operator)
-                operator_schedule = generate_operator_schedule(final_operator_stack)
-            valid_term = scheduled_term(course_descriptions, top_course, operator_schedule)
-            if valid_term:
-                operated_state_copy = operated_state.copy()
-                operated_state_copy.pop()
-                top_course_prereqs = course_descriptions[top_course].prereqs
-                tuple_stack.pop()
-                # if there is prereq branching, we can apply a heuristic
-                if top_course_prereqs:
-                    tuple_stack = prereq_heuristic(course_descriptions, tuple_stack, final_operator_stack,
-                                                   operated_state_copy, top_course_prereqs, top_course, valid_term)
-                # otherwise simply add to valid location
-                else:
-                    state_add = operated_state_copy.copy()
-                    operator_add = Operator((), top_course, valid_term, course_descriptions[top_course].credits)
-                    new_operator_stack = final_operator_stack.copy()
-                    new_operator_stack.append(operator_add)
-                    tuple_stack.append((state_add, new_operator_stack))
+    return search_schedule(course_descriptions, goal_conditions, initial_state, engine, weight, table_size,
+                           eviction).schedule
+
+
+def search_schedule(course_descriptions, goal_conditions, initial_state, engine='dfs', weight=1.0,
+                    table_size=TRANSPOSITION_TABLE_SIZE, eviction=TRANSPOSITION_EVICTION, time_limit=None,
+                    node_limit=None, cancel=None, branch_share=None, stats=None, propagate=True, backjump=True,
+                    sub_plans=None):
+    """
+    course_scheduler with optional budgets. The search stops once it has run for time_limit seconds, expanded
+    node_limit nodes or once cancel is set, whichever comes first, and reports the best partial schedule found so
+    far instead of running until the tuple stack is exhausted.
+    :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+    (or an InternedCatalog built from it)
+    :param goal_conditions: list of courses required in a valid schedule
+    :param initial_state: list of courses already fulfilled, not scheduled
+    :param engine: search engine, see course_scheduler
+    :param weight: weight of the cost to go estimate for the best_first engine
+    :param table_size: memory cap of the transposition table in entries, 0 to disable it
+    :param eviction: eviction policy of the transposition table, 'lru' or 'fifo'
+    :param time_limit: wall clock budget in seconds, None for no limit
+    :param node_limit: budget of expanded nodes, None for no limit
+    :param cancel: object with an is_set() method (e.g. threading.Event) polled for cooperative cancellation
+    :param branch_share: (share, shares) to search only one of shares disjoint parts of the search tree, see
+    split_branches; None searches all of it
+    :param stats: SearchStats filled with statistics of the search (and its on_expand hook called), or None
+    :param propagate: whether to forward check the term domains of freshly pushed prereqs, see
+    SearchContext.consistent_child
+    :param backjump: whether the dfs engine skips siblings doomed by the same conflict, see SearchContext.backjump
+    :param sub_plans: SubPlanCache to first try composing the schedule from the goals' cached sub-plans, see
+    compose_sub_plans; the composed schedule can differ from the one the search finds. None always searches
+    :return: SearchResult
+    """
+    if engine not in SEARCH_ENGINES:
+        raise ValueError('engine must be one of %s' % (SEARCH_ENGINES,))
+    catalog = intern_catalog(course_descriptions)
+    initial_ids = catalog.intern_all(initial_state)
+    initial_keys = set(tuple(course) for course in initial_state)
+    # goals fulfilled by the initial state would only be popped again, so they are left out up front
+    goal_ids = [catalog.intern(goal) for goal in goal_conditions if tuple(goal) not in initial_keys]
+    if not goal_ids:
+        # nothing left to schedule: the empty schedule is the solution
+        return SearchResult('solved', True, {}, {}, [], 0)
+    if sub_plans is not None:
+        if stats is not None:
+            stats.start_phase('search')
+        operator_stack, sub_plan_nodes = compose_sub_plans(catalog, goal_ids, initial_ids, sub_plans)
+        if operator_stack is not None:
+            schedule_hours = generate_schedule_hours(catalog, generate_operator_schedule(operator_stack))
+            schedule = finish_schedule(catalog, schedule_hours, operator_stack, stats)
+            return SearchResult('solved', True, schedule, schedule, [], sub_plan_nodes)
+    if stats is not None:
+        stats.start_phase('state_init')
+    context = SearchContext(catalog, initial_ids, table_size, eviction, time_limit, node_limit, cancel, stats,
+                            propagate, backjump)
+    tuple_stack = state_init(catalog, goal_ids, context.earliest_terms)
+    if branch_share is not None:
+        share, shares = branch_share
+        tuple_stack = split_branches(context, tuple_stack, shares * BRANCH_SPLIT_FACTOR)[share::shares]
+    if stats is not None:
+        stats.start_phase('search')
+    if engine == 'dfs':
+        operators = depth_first_search(context, tuple_stack)
+    else:
+        operators = best_first_search(context, tuple_stack, weight)
+    if operators is not None:
+        context.schedule_index.seek(operators)
+        schedule = finish_schedule(catalog, context.schedule_index.hours.copy(), generate_operator_stack(operators),
+                                   stats)
+        result = SearchResult('solved', True, schedule, schedule, [], context.nodes_expanded)
+    else:
+        if stats is not None:
+            stats.start_phase('output')
+        partial_operator_stack = completed_operators(catalog, initial_ids, context.best_operators)
+        scheduled = set(generate_course_list(partial_operator_stack))
+        remaining_goals = [catalog.courses[goal] for goal in goal_ids if goal not in scheduled]
+        result = SearchResult(context.stopped or 'infeasible', context.stopped is None, {},
+                              generate_scheduler_output(catalog, partial_operator_stack), remaining_goals,
+                              context.nodes_expanded)
+    if stats is not None:
+        stats.start_phase(None)
+    return result
+
+
+def alternative_schedules(course_descriptions, goal_conditions, initial_state, k=None,
+                          table_size=TRANSPOSITION_TABLE_SIZE, eviction=TRANSPOSITION_EVICTION, time_limit=None,
+                          node_limit=None, cancel=None, stats=None, propagate=True, backjump=True):
+    """
+    Lazily enumerates distinct solutions of one depth first search. The first schedule yielded is the one
+    course_scheduler returns; after each one the search resumes from the tuple stack it left behind, so a caller
+    that stops iterating never pays for the rest of the enumeration. Schedules assigning every course to the same
+    term are yielded once, even when the search reached them through different prereq disjunctions. The budgets
+    cover the whole enumeration.
+    :param course_descriptions: dictionary of offered Vanderbilt courses and related information
+    (or an InternedCatalog built from it)
+    :param goal_conditions: list of courses required in a valid schedule
+    :param initial_state: list of courses already fulfilled, not scheduled
+    :param k: maximum number of schedules to yield, None for every one the search finds
+    :param table_size: memory cap of the transposition table in entries, 0 to disable it
+    :param eviction: eviction policy of the transposition table, 'lru' or 'fifo'
+    :param time_limit: wall clock budget in seconds, None for no limit
+    :param node_limit: budget of expanded nodes, None for no limit
+    :param cancel: object with an is_set() method polled for cooperative cancellation, or None
+    :param stats: SearchStats filled with statistics of the enumeration, or None
+    :param propagate: whether to forward check the term domains of freshly pushed prereqs
+    :param backjump: whether to skip siblings doomed by the same conflict
+    :return: generator of solution dictionaries
+    """
+    if k is not None and k <= 0:
+        return
+    catalog = intern_catalog(course_descriptions)
+    initial_ids = catalog.intern_all(initial_state)
+    initial_keys = set(tuple(course) for course in initial_state)
+    goal_ids = [catalog.intern(goal) for goal in goal_conditions if tuple(goal) not in initial_keys]
+    if not goal_ids:
+        yield {}
+        return
+    if stats is not None:
+        stats.start_phase('state_init')
+    context = SearchContext(catalog, initial_ids, table_size, eviction, time_limit, node_limit, cancel, stats,
+                            propagate, backjump)
+    tuple_stack = state_init(catalog, goal_ids, context.earliest_terms)
+    seen = set()
+    # a caller that stops early closes the generator at its yield; the timed phase is still ended
+    try:
+        while True:
+            if stats is not None:
+                stats.start_phase('search')
+            operators = depth_first_search(context, tuple_stack)
+            if operators is None:
+                break
+            context.schedule_index.seek(operators)
+            schedule = finish_schedule(catalog, context.schedule_index.hours.copy(),
+                                       generate_operator_stack(operators), stats)
+            assignment = frozenset((course, tuple(course_info.terms)) for course, course_info in schedule.items())
+            if assignment in seen:
+                continue
+            seen.add(assignment)
+            yield schedule
+            if k is not None and len(seen) >= k:
+                break
+    finally:
+        if stats is not None:
+            stats.start_phase(None)
+
+
+def finish_schedule(catalog, schedule_hours, operator_stack, stats=None):
+    """
+    Fills the terms of a complete operator stack to the minimum credit hours and builds the scheduler output.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param schedule_hours: list of integers holding the scheduled credit hours of each term, updated in place
+    :param operator_stack: list of the operators of the schedule
+    :param stats: SearchStats timing the fill and output phases, or None
+    :return: solution dictionary, see generate_scheduler_output
+    """
+    if stats is not None:
+        stats.start_phase('fill')
+    # generates the final operator stack after filling terms to minimum credit hours
+    final_operator_stack = fill_terms(catalog, schedule_hours, operator_stack, stats)
+    if stats is not None:
+        stats.start_phase('output')
+    schedule = generate_scheduler_output(catalog, final_operator_stack)
+    if stats is not None:
+        stats.start_phase(None)
+    return schedule
+
 
+def solve_sub_plan(catalog, requirement, initial_ids, node_limit=SUB_PLAN_NODE_LIMIT):
+    """
+    Searches a schedule for one requirement on its own and turns it into a sub-plan, terms relative to the
+    requirement's term.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param requirement: course id of the requirement
+    :param initial_ids: set of course ids already fulfilled, not scheduled
+    :param node_limit: budget of expanded nodes
+    :return: (SubPlan, or None if the search found no schedule within the budget, nodes expanded)
+    """
+    context = SearchContext(catalog, initial_ids, node_limit=node_limit, propagate=True, backjump=True)
+    operators = depth_first_search(context, state_init(catalog, [requirement], context.earliest_terms))
+    if operators is None:
+        return None, context.nodes_expanded
+    operator_stack = generate_operator_stack(operators)
+    anchor = next(placement.term for placement in operator_stack if placement.course == requirement)
+    placements = tuple((placement.course, placement.disjunct, placement.term - anchor)
+                       for placement in reversed(operator_stack))
+    return SubPlan(anchor, placements), context.nodes_expanded
+
+
+def compose_sub_plans(catalog, goal_ids, initial_ids, sub_plans):
+    """
+    Composes a schedule out of the sub-plans of the goals, solving and caching the ones missing from the cache.
+    The sub-plans are merged goal by goal: a course in several of them keeps its earliest placement, which still
+    precedes every dependent, and a sub-plan that would overfill a term is moved a whole year earlier (so every
+    course stays in the same semester) until it fits or would start before the first term.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param goal_ids: list of course ids required in a valid schedule and not in the initial state
+    :param initial_ids: set of course ids already fulfilled, not scheduled
+    :param sub_plans: SubPlanCache
+    :return: (list of operators of the composed schedule, or None if some goal has no sub-plan or they do not fit
+    together, nodes expanded solving sub-plans)
+    """
+    nodes_expanded = 0
+    placements = {}
+    for goal in goal_ids:
+        key = sub_plan_key(catalog, goal, initial_ids)
+        cached, sub_plan = sub_plans.get(key)
+        if not cached:
+            closure = catalog.closure_masks()[goal]
+            initial_slice = {course for course in initial_ids if closure >> course & 1}
+            sub_plan, nodes = solve_sub_plan(catalog, goal, initial_slice)
+            nodes_expanded += nodes
+            sub_plans.put(key, sub_plan)
+        if sub_plan is None:
+            return None, nodes_expanded
+        first_term = sub_plan.anchor + min(offset for _, _, offset in sub_plan.placements)
+        shift = 0
+        while True:
+            if first_term + shift < 1:
+                return None, nodes_expanded
+            merged = placements.copy()
+            for course, disjunct, offset in sub_plan.placements:
+                term = sub_plan.anchor + offset + shift
+                if course not in merged or term < merged[course].term:
+                    merged[course] = Placement(course, disjunct, term)
+            hours = generate_schedule_hours(catalog, generate_operator_schedule(merged.values()))
+            if all(hours[idx] <= term_capacity(idx + 1) for idx in range(MAX_NUMBER_OF_TERMS)):
+                placements = merged
+                break
+            shift -= NUMBER_OF_SEMESTERS
+    return list(placements.values()), nodes_expanded
+
+
+def split_branches(context, tuple_stack, count):
+    """
+    Expands the tuples of a search level by level, keeping their stack order, until there are at least count
+    top-level branches (or BRANCH_SPLIT_DEPTH levels were expanded). Searching every branch of the result covers
+    the same tree as searching tuple_stack, so disjoint slices of it can be searched independently.
+    :param context: SearchContext of the search
+    :param tuple_stack: tuples as built by state_init
+    :param count: number of branches wanted
+    :return: list of (state, operators) tuples; completed states are kept as they are
+    """
+    for _ in range(BRANCH_SPLIT_DEPTH):
+        if len(tuple_stack) >= count:
+            break
+        expanded = []
+        for state, operators in tuple_stack:
+            settled = context.settle(state)
+            if settled is None:
+                expanded.append((state, operators))
             else:
-                # no valid option so pop the state from the state_stack; leads to the next possible
-                # option for a prereq completion
-                tuple_stack.pop()
-        else:
-            # remove if course already fulfilled by initial state
-            operated_state.pop()
-        top_tuple = tuple_stack[len(tuple_stack) - 1] if len(tuple_stack) != 0 else ()
-        operated_state = []
-        if top_tuple:
-            operated_state = top_tuple[0] if len(top_tuple[0]) != 0 else []
-            final_operator_stack = top_tuple[1]
-        else:
-            final_operator_stack = []
-    if top_tuple:
-        # generates the final operator stack after filling terms to minimum credit hours
-        regression_schedule_hours = generate_schedule_hours(generate_operator_schedule(final_operator_stack))
-        final_operator_stack = fill_terms(course_descriptions, regression_schedule_hours, final_operator_stack)
-    return generate_scheduler_output(final_operator_stack)
+                children = context.expand(settled, operators)
+                # there is no sibling to jump over while splitting, and the schedule index moves on to the next
+                # tuple, so a rejection must not leave a conflict behind for the search
+                context.conflict = None
+                expanded += children
+                if context.stats is not None:
+                    context.stats.nodes_popped += 1
+                    context.observe(children, len(expanded))
+        tuple_stack = expanded
+    return tuple_stack
+
+
+def completed_operators(catalog, initial_ids, operators):
+    """
+    Keeps the operators of a partial search node whose prereq chains are fully placed (or fulfilled by the initial
+    state), so the result is a valid schedule on its own.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param initial_ids: set of course ids already fulfilled, not scheduled
+    :param operators: OperatorNode of the node's newest operator, or None
+    :return: list of operators whose chains are complete
+    """
+    placements = {placement.course: placement for placement in generate_operator_stack(operators)}
+    completed = {}
+
+    def is_completed(course):
+        if course in initial_ids:
+            return True
+        if course not in completed:
+            placement = placements.get(course)
+            # marked first so a (malformed) prereq cycle counts as incomplete
+            completed[course] = False
+            completed[course] = placement is not None and (
+                placement.disjunct < 0 or all(is_completed(prereq) for prereq in catalog.prereqs(placement.disjunct)))
+        return completed[course]
+
+    return [placement for course, placement in placements.items() if is_completed(course)]
+
+
+class SearchContext:
+    def __init__(self, catalog, initial_ids, table_size=TRANSPOSITION_TABLE_SIZE, eviction=TRANSPOSITION_EVICTION,
+                 time_limit=None, node_limit=None, cancel=None, stats=None, propagate=False, backjump=False):
+        """
+        Everything the nodes of one search share: the catalog, the initial state, the earliest term bounds, the
+        ScheduleIndex following the node being expanded, the transposition table, the search budgets and the
+        optional statistics.
+        :param catalog: interned catalog of offered Vanderbilt courses and related information
+        :param initial_ids: set of course ids already fulfilled, not scheduled
+        :param table_size: memory cap of the transposition table in entries, 0 to disable it
+        :param eviction: eviction policy of the transposition table, 'lru' or 'fifo'
+        :param time_limit: wall clock budget in seconds, None for no limit
+        :param node_limit: budget of expanded nodes, None for no limit
+        :param cancel: object with an is_set() method polled for cooperative cancellation, or None
+        :param stats: SearchStats to fill, or None
+        :param propagate: whether expand cuts off nodes failing consistent_child
+        :param backjump: whether expand records the conflicts backjump works from
+        """
+        self.catalog = catalog
+        self.initial_ids = initial_ids
+        self.earliest_terms = earliest_terms(catalog, initial_ids)
+        self.schedule_index = ScheduleIndex(catalog, MAX_NUMBER_OF_TERMS)
+        self.transpositions = TranspositionTable(table_size, eviction) if table_size else None
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit
+        self.node_limit = node_limit
+        self.cancel = cancel
+        self.nodes_expanded = 0
+        # status of a search cut short by a budget, None while it runs
+        self.stopped = None
+        # most advanced node seen: the one with the fewest courses left in its state
+        self.best_operators = None
+        self._best_size = None
+        self.stats = stats
+        self.propagate = propagate
+        self.backjump_enabled = backjump
+        # (course, state, operators) of the latest expansion rejected by scheduled_term, while backjumping
+        self.conflict = None
+        # course id -> Nogoods of its rejections, recorded while backjumping
+        self.nogoods = {}
+        # course and term of the latest expansion, only kept while collecting statistics
+        self._expanded = None
+
+    def exhausted(self):
+        """
+        Checks the budgets before a node is expanded and records why the search stops.
+        :return: True if the search must stop
+        """
+        if self.node_limit is not None and self.nodes_expanded >= self.node_limit:
+            self.stopped = 'node_limit'
+        elif self.nodes_expanded % BUDGET_CHECK_INTERVAL == 0:
+            if self.cancel is not None and self.cancel.is_set():
+                self.stopped = 'cancelled'
+            elif self.deadline is not None and time.monotonic() >= self.deadline:
+                self.stopped = 'time_limit'
+        return self.stopped is not None
+
+    def record(self, state, operators):
+        """Remembers a settled, non-empty state's operators if it has fewer courses left than any node before."""
+        if self._best_size is None or state.size < self._best_size:
+            self._best_size = state.size
+            self.best_operators = operators
+
+    def settle(self, state):
+        """Pops every course fulfilled by the initial state off the top of a state; None means the state is done."""
+        while state is not None and top_of_state(state) in self.initial_ids:
+            state = pop_state(state)
+        return state
+
+    def expand(self, state, operators):
+        """
+        Schedules the top course of a settled, non-empty state and expands it into its prereq disjunctions.
+        :param state: StateNode whose top course is not in the initial state
+        :param operators: OperatorNode of the state's operators
+        :return: list of (state, operators) children, most promising last; empty when no valid option exists
+        """
+        self.nodes_expanded += 1
+        stats = self.stats
+        top_course = top_of_state(state)
+        self.schedule_index.seek(operators)
+        # a state already expanded with the same remaining goals on top of the same schedule is skipped
+        if self.transpositions is not None and self.transpositions.visit(state.key ^ self.schedule_index.key):
+            if stats is not None:
+                stats.transposition_hits += 1
+                self._expanded = top_course, None
+            return []
+        if self.propagate and not self.consistent_child(state, operators):
+            if stats is not None:
+                stats.propagation_cutoffs += 1
+                self._expanded = top_course, None
+            return []
+        if self.nogoods and self.doomed_by_nogood(state):
+            if stats is not None:
+                stats.nogood_cutoffs += 1
+                self._expanded = top_course, None
+            return []
+        # a course that is already scheduled is placed again; the new operator supersedes the old one and
+        # will either place it in the same place or a new valid location
+        valid_term = scheduled_term(self.catalog, top_course, self.schedule_index, self.earliest_terms)
+        if stats is not None:
+            self._expanded = top_course, valid_term
+        if not valid_term:
+            if self.backjump_enabled:
+                self.conflict = top_course, state, operators
+            if stats is not None:
+                stats.rejections[rejection_cause(self.catalog, top_course, self.schedule_index,
+                                                 self.earliest_terms)] += 1
+            return []
+        remaining_state = pop_state(state)
+        # if there is prereq branching, we can apply a heuristic
+        if self.catalog.disjuncts(top_course):
+            children = prereq_heuristic(self.catalog, [], operators, remaining_state, top_course, valid_term,
+                                        self.earliest_terms)
+            return children
+        # otherwise simply add to valid location
+        return [(remaining_state, OperatorNode(Placement(top_course, -1, valid_term), operators))]
+
+    def consistent_child(self, state, operators):
+        """
+        Forward checks a node fresh from a prereq expansion, before its first prereq is scheduled: every prereq
+        pushed with the parent's placement must still have a non-empty term domain, and together the prereqs not
+        yet scheduled must fit into the free credit hours of the union of their domains. A node failing either
+        check would fail once those prereqs are expanded. Other nodes are not checked.
+        :param state: settled StateNode of the node
+        :param operators: OperatorNode of the node, the index already moved onto it
+        :return: False if the node is known to be a dead branch
+        """
+        catalog = self.catalog
+        disjunct = operators.placement.disjunct if operators else -1
+        # only a state that is still exactly the pushed prereq slice is fresh
+        if disjunct < 0 or state.courses is not catalog.prereq_ids or state.start != catalog.prereq_start[disjunct] \
+                or state.end != catalog.prereq_start[disjunct + 1]:
+            return True
+        placements = self.schedule_index.placements
+        hours = self.schedule_index.hours
+        union = 0
+        unscheduled_credits = 0
+        for prereq in catalog.prereqs(disjunct):
+            if prereq in self.initial_ids:
+                continue
+            domain = term_domain(catalog, prereq, self.schedule_index, self.earliest_terms)
+            if not domain:
+                return False
+            if prereq not in placements:
+                union |= domain
+                unscheduled_credits += catalog.credits[prereq]
+        free_credits = 0
+        term_no = 1
+        while union:
+            if union & 1:
+                free_credits += term_capacity(term_no) - hours[term_no - 1]
+            union >>= 1
+            term_no += 1
+        return unscheduled_credits <= free_credits
+
+    def backjump(self, tuple_stack):
+        """
+        Conflict-directed backjumping after scheduled_term rejected the top course of a node. The conflict is the
+        set of placements that empty the course's term domain: the plain dependents bounding it from above and
+        every placement in the offered terms it could still use (capacity), together with the placement whose
+        disjunct pushed the course. Siblings waiting on top of the tuple stack that keep all of these placements
+        fail on the same course, so they are popped without being expanded: the siblings of every decision made
+        after the deepest conflict placement, and those of the deepest one too when only its term and credit
+        hours (which all its siblings share) are involved. A sibling whose courses expanded before the rejected
+        course could reschedule one of the conflict courses is kept, since moving it can free the conflict.
+        :param tuple_stack: the depth first search's stack, the rejected node already popped
+        :return: number of tuples popped
+        """
+        course, state, operators = self.conflict
+        self.conflict = None
+        # the conflict is recorded as a nogood even when there is nothing to jump over
+        conflict = self.conflict_placements(course)
+        if not tuple_stack or tuple_stack[-1][1] is None:
+            return 0
+        catalog = self.catalog
+        # operator chain of the node, newest first; depth of the current placement of every placed course
+        chain = []
+        node = operators
+        while node is not None:
+            chain.append(node)
+            node = node.parent
+        depths = {}
+        for position, node in enumerate(chain):
+            depths.setdefault(node.placement.course, len(chain) - position)
+        # the decision that pushed the course; goals are pushed by state_init for every branch
+        deepest, decisive = 0, True
+        if state.courses is catalog.prereq_ids:
+            disjunct = catalog.disjunct_at(state.start)
+            for position, node in enumerate(chain):
+                if node.placement.disjunct == disjunct:
+                    deepest = len(chain) - position
+                    break
+        conflict_courses = {course}
+        for placed, bounding in conflict:
+            conflict_courses.add(placed)
+            depth = depths[placed]
+            if depth > deepest:
+                deepest, decisive = depth, bounding
+            elif depth == deepest:
+                decisive = decisive or bounding
+        # siblings of the decisions at these depths are doomed; a tuple's decision depth is its parent's plus one
+        first_depth = deepest if decisive else deepest - 1
+        doomed_parents = {id(node) for position, node in enumerate(chain) if len(chain) - position >= first_depth}
+        closures = catalog.closure_masks()
+        conflict_mask = 0
+        for conflict_course in conflict_courses:
+            conflict_mask |= 1 << conflict_course
+        popped = 0
+        while tuple_stack:
+            sibling_state, sibling_operators = tuple_stack[-1]
+            if sibling_operators is None or id(sibling_operators.parent) not in doomed_parents:
+                break
+            # every course above the rejected one is expanded first and may push (and reschedule) its closure
+            above = 0
+            node = sibling_state
+            found = False
+            while node is not None and not found:
+                for idx in range(node.end - 1, node.start - 1, -1):
+                    if node.courses[idx] == course:
+                        found = True
+                        break
+                    above |= closures[node.courses[idx]]
+                node = node.parent
+            if not found or above & conflict_mask:
+                break
+            tuple_stack.pop()
+            popped += 1
+        return popped
+
+    def conflict_placements(self, course):
+        """
+        Works out why scheduled_term rejects a course on the current schedule and records it as a Nogood. The
+        conflict consists of the plain dependents bounding the course's terms from above and every placement in the
+        offered terms it could still use; the nogood keeps one bounding dependent and, per term, only the largest
+        placements that already leave no room for the course.
+        :param course: course id scheduled_term just rejected
+        :return: list of (course id, whether it bounds the course's terms) of the conflict, the course left out
+        """
+        catalog = self.catalog
+        lowest_term = self.earliest_terms[course]
+        if lowest_term > MAX_NUMBER_OF_TERMS:
+            self.record_nogood(course, Nogood((), None, 1 << course))
+            return []
+        placements = self.schedule_index.placements
+        latest_term = MAX_NUMBER_OF_TERMS
+        for placed, placement in placements.items():
+            if placed != course and placement.disjunct >= 0 and not catalog.higher[placed] \
+                    and placement.term - 1 < latest_term and course in catalog.prereqs(placement.disjunct):
+                latest_term = placement.term - 1
+        window = offered_terms(catalog)[course] & ((1 << latest_term) - 1) & -(1 << (lowest_term - 1)) \
+            if latest_term >= lowest_term else 0
+        conflict = []
+        bounding_placement = None
+        term_placements = {}
+        for placed, placement in placements.items():
+            bounding = placement.term == latest_term + 1 and placement.disjunct >= 0 \
+                and not catalog.higher[placed] and course in catalog.prereqs(placement.disjunct)
+            if placed == course or not (bounding or window & (1 << (placement.term - 1))):
+                continue
+            conflict.append((placed, bounding))
+            if bounding:
+                bounding_placement = bounding_placement or placement
+            else:
+                term_placements.setdefault(placement.term, []).append(placed)
+        capacity = []
+        mask = 1 << course
+        if bounding_placement is not None:
+            mask |= 1 << bounding_placement.course
+        for term_no, courses in term_placements.items():
+            # the course does not fit once the other placements hold more than this many credit hours
+            needed = term_capacity(term_no) - catalog.credits[course] + 1
+            for placed in sorted(courses, key=lambda placed: -catalog.credits[placed]):
+                if needed <= 0:
+                    break
+                capacity.append((placed, term_no))
+                mask |= 1 << placed
+                needed -= catalog.credits[placed]
+        self.record_nogood(course, Nogood(tuple(capacity), bounding_placement, mask))
+        return conflict
+
+    def record_nogood(self, course, nogood):
+        """Stores a Nogood of a course, dropping its oldest one beyond NOGOODS_PER_COURSE."""
+        nogoods = self.nogoods.setdefault(course, [])
+        if nogood not in nogoods:
+            nogoods.append(nogood)
+            if len(nogoods) > NOGOODS_PER_COURSE:
+                del nogoods[0]
+
+    def nogood_holds(self, nogood):
+        """Checks whether the current schedule holds every placement of a Nogood."""
+        placements = self.schedule_index.placements
+        if nogood.bounding is not None and placements.get(nogood.bounding.course) != nogood.bounding:
+            return False
+        for placed, term_no in nogood.capacity:
+            placement = placements.get(placed)
+            if placement is None or placement.term != term_no:
+                return False
+        return True
+
+    def doomed_by_nogood(self, state):
+        """
+        Checks a node against the recorded nogoods: a course below the top of the state whose nogood the schedule
+        holds is rejected once it reaches the top, unless a course expanded before it (one above it in the state,
+        or anything in such a course's prereq closure) is part of the nogood and can still move. The top course
+        itself is left to scheduled_term, so its rejection still leads to a backjump.
+        :param state: settled StateNode of the node, the index already moved onto its operators
+        :return: True if the node is known to be a dead branch
+        """
+        closures = self.catalog.closure_masks()
+        nogoods = self.nogoods
+        above = 0
+        node = state
+        while node is not None:
+            for idx in range(node.end - 1, node.start - 1, -1):
+                course = node.courses[idx]
+                if above and course in nogoods:
+                    for nogood in nogoods[course]:
+                        if not nogood.mask & above and self.nogood_holds(nogood):
+                            return True
+                above |= closures[course]
+            node = node.parent
+        return False
+
+    def observe(self, children, stack_depth):
+        """
+        Adds the latest expansion to the statistics and hands it to their on_expand hook. Only called while
+        collecting statistics.
+        :param children: children the expansion produced
+        :param stack_depth: number of tuples waiting in the search after the children were pushed
+        """
+        stats = self.stats
+        stats.nodes_expanded += 1
+        if not children:
+            stats.backtracks += 1
+        if stack_depth > stats.max_stack_depth:
+            stats.max_stack_depth = stack_depth
+        if stats.on_expand is not None:
+            course, term = self._expanded
+            stats.on_expand(Expansion(self.catalog.courses[course], term, len(children), stack_depth))
+
+    def cost_to_go(self, state):
+        """
+        Estimates the remaining effort of a state as the sum of course_cost_estimates over its remaining courses,
+        leaving out courses fulfilled by the initial state.
+        """
+        course_costs = self.catalog.derived.get('course_costs')
+        if course_costs is None:
+            course_costs = self.catalog.derived['course_costs'] = course_cost_estimates(self.catalog)
+        estimate = 0
+        while state is not None:
+            for idx in range(state.start, state.end):
+                if state.courses[idx] not in self.initial_ids:
+                    estimate += course_costs[state.courses[idx]]
+            state = state.parent
+        return estimate
+
+
+def course_cost_estimates(catalog):
+    """
+    Per course cost to go used by SearchContext.cost_to_go: the placements its cheapest prereq closure needs,
+    each placement counting 1 plus its credit hours as a fraction of a full term. Expanding a course along its
+    cheapest disjunct lowers the estimate by exactly one placement, so best first search follows that disjunct
+    until it fails. Courses behind a prereq cycle are capped at a full schedule.
+    """
+    unit_costs = [1 + credits / MAX_CREDITS_PER_NON_SUMMER_TERM for credits in catalog.credits]
+    full_schedule = MAX_NUMBER_OF_TERMS * MAX_CREDITS_PER_NON_SUMMER_TERM
+    return [min(cost, full_schedule) for cost in catalog.closure_costs(unit_costs)]
 
 
-def prereq_heuristic(course_descriptions, tuple_stack, operator_stack, state, prerequisites, course, term):
+def depth_first_search(context, tuple_stack):
     """
-    Function that selectively expands a selected course into prerequisites. Calculates a heuristic value to
-    potentially minimize prerequisite paths then creates a sorted list to expand the tuple_stack in optimized
-    order.
-    :param course_descriptions: course_descriptions: dictionary of offered Vanderbilt courses and related information
+    The heuristic depth first regression search: the top tuple of the stack is expanded until one reaches an empty
+    state or the stack of states is empty (tried all options).
+    :param context: SearchContext of the search
     :param tuple_stack: stack list data structure that holds tuples of the state and an associated operator stack
-    :param operator_stack: stack list data structure that holds operators representing scheduled
-    courses of the current state
-    :param state: current state in the search being considered
-    :param prerequisites: prerequisites in DNF form of the course being considered
+    :return: OperatorNode of the completed schedule, or None if no valid schedule exists or a budget ran out
+    """
+    stats = context.stats
+    while tuple_stack:
+        state, operators = tuple_stack.pop()
+        if stats is not None:
+            stats.nodes_popped += 1
+        state = context.settle(state)
+        if state is None:
+            return operators
+        if context.exhausted():
+            return None
+        context.record(state, operators)
+        # the tuple is replaced by its expansions, or dropped when there is no valid option; leads to
+        # the next possible option for a prereq completion
+        children = context.expand(state, operators)
+        tuple_stack += children
+        if context.conflict is not None:
+            popped = context.backjump(tuple_stack)
+            if stats is not None:
+                stats.backjumped += popped
+        if stats is not None:
+            context.observe(children, len(tuple_stack))
+    return None
+
+
+def best_first_search(context, tuple_stack, weight):
+    """
+    Weighted A* over the same nodes as depth_first_search. Nodes are ordered by the number of operators placed plus
+    weight times context.cost_to_go; among equal values the most recently pushed node comes first, which keeps the
+    prereq_heuristic order. A weight of 1 follows the estimate, higher weights search more greedily.
+    :param context: SearchContext of the search
+    :param tuple_stack: initial tuples as built by state_init
+    :param weight: weight of the cost to go estimate
+    :return: OperatorNode of the completed schedule, or None if no valid schedule exists or a budget ran out
+    """
+    frontier = []
+    pushed = 0
+    for state, operators in tuple_stack:
+        pushed += 1
+        heapq.heappush(frontier, (1 + weight * context.cost_to_go(state), -pushed, 1, state, operators))
+    stats = context.stats
+    while frontier:
+        _, _, placed, state, operators = heapq.heappop(frontier)
+        if stats is not None:
+            stats.nodes_popped += 1
+        state = context.settle(state)
+        if state is None:
+            return operators
+        if context.exhausted():
+            return None
+        context.record(state, operators)
+        children = context.expand(state, operators)
+        for child_state, child_operators in children:
+            pushed += 1
+            heapq.heappush(frontier, (placed + 1 + weight * context.cost_to_go(child_state), -pushed, placed + 1,
+                                      child_state, child_operators))
+        if stats is not None:
+            context.observe(children, len(frontier))
+    return None
+
+
+def prereq_heuristic(catalog, tuple_stack, operators, state, course, term, earliest=None):
+    """
+    Function that selectively expands a selected course into prerequisites. The heuristic value that
+    potentially minimizes prerequisite paths is precomputed per course by the interned catalog
+    (heuristic_order), so the tuple_stack is expanded directly in optimized order.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param tuple_stack: stack list data structure that holds tuples of the state and an associated operator stack
+    :param operators: OperatorNode holding the operators representing scheduled courses of the current state
+    :param state: StateNode of the current state in the search being considered, top course already popped
     :param course: top course in the current state, being considered for expansion
     :param term: calculated valid term to be added in the operator
+    :param earliest: earliest_terms bounds; disjuncts whose prereqs cannot be completed in time are not pushed
     :return: updated tuple_stack with heuristic course prereq expansion
     """
-    unordered_heuristic_prereqs = []
-    # per prereq disjunction
-    for prereqs in prerequisites:
-        heuristic_sum = 0
-        # check that the course is not a higher requirement (no front number)
-        for course_tuple in prereqs:
-            if not is_higher_requirement((course_tuple[0], course_tuple[1])):
-                course_designation_top_value = int(course_tuple[1][0])
-                heuristic_sum += course_designation_top_value
-        # add prereq with sum to be sorted by sum
-        unordered_heuristic_prereqs.append((heuristic_sum, prereqs))
-    # reverse to get lowest heuristic prereq to top of stack
-    reverse_ordered_heuristic_prereqs = reversed(sorted(unordered_heuristic_prereqs))
-    for heuristic_tuple in reverse_ordered_heuristic_prereqs:
-        # create tuple and add to stack per prereq
-        heuristic_prereqs = heuristic_tuple[1]
-        state_add = state.copy()
-        state_add += list(heuristic_prereqs)
-        operator_add = Operator(heuristic_prereqs, course, term,
-                                course_descriptions[course].credits)
-        new_operator_stack = operator_stack.copy()
-        new_operator_stack.append(operator_add)
-        tuple_stack.append((state_add, new_operator_stack))
+    # least promising disjunct first so the lowest heuristic prereq ends on top of the stack
+    for disjunct in catalog.ordered_disjuncts(course):
+        if earliest and not disjunct_ready(catalog, course, disjunct, term, earliest):
+            continue
+        # create tuple and add to stack per prereq; both nodes share everything below them
+        state_add = push_state(state, catalog.prereq_ids,
+                               catalog.prereq_start[disjunct], catalog.prereq_start[disjunct + 1])
+        tuple_stack.append((state_add, OperatorNode(Placement(course, disjunct, term), operators)))
     return tuple_stack
 
 
-def fill_terms(course_descriptions, schedule_hours, operator_stack):
+def fill_terms(catalog, schedule_hours, operator_stack, stats=None):
     """
-
-    :param course_descriptions: course_descriptions: dictionary of offered Vanderbilt courses and related information
+    Adds prereq-free courses, in catalog order, to every non-empty term until it reaches the minimum credit hours.
+    Candidates come from the filler index, so each added course looks at one entry per credit value instead of
+    scanning the catalog.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
     :param schedule_hours: list of integers holding currently scheduled credit hours of each term
     associated by the index
     :param operator_stack: stack list data structure that holds operators representing scheduled
     courses of the current state
+    :param stats: SearchStats counting the fill iterations, or None
     :return: updated operator stack with filler operators to fulfill credit minimum
     """
-    course_list = generate_course_list(operator_stack)
+    course_list = set(generate_course_list(operator_stack))
+    index = filler_index(catalog)
+    # per semester and credit bucket, position of the first course not known to be scheduled
+    cursors = [[0] * len(buckets) for buckets in index]
     for idx in range(len(schedule_hours)):
         # assign credit boundaries depending on term
         min_credits = MIN_CREDITS_PER_NON_SUMMER_TERM
@@ -347,26 +1059,84 @@ def fill_terms(course_descriptions, schedule_hours, operator_stack):
                 else MIN_CREDITS_PER_NON_SUMMER_TERM
             max_credits = MAX_CREDITS_PER_SUMMER_TERM if (idx + 1) % NUMBER_OF_SEMESTERS == 0 \
                 else MAX_CREDITS_PER_NON_SUMMER_TERM
-        if schedule_hours[idx] > 0:
-            # continue to add course operator while not fulfilling constraint
-            while schedule_hours[idx] < min_credits:
-                for course in course_descriptions:
-                    course_description = course_descriptions[course]
-                    if not course_list.count(course) and course_description.prereqs == () \
-                            and schedule_hours[idx] + int(course_description.credits) <= max_credits \
-                            and course_description.terms.count(Term.initFromTermNo(idx + 1).semester.name):
-                        operator_add = Operator(course_description.prereqs, (course.program, course.designation),
-                                                Term.initFromTermNo(idx + 1), course_description.credits)
-                        operator_stack.append(operator_add)
-                        course_list.append(course)
-                        schedule_hours[idx] += int(course_description.credits)
-                        break
+        buckets = index[idx % NUMBER_OF_SEMESTERS]
+        positions = cursors[idx % NUMBER_OF_SEMESTERS]
+        # continue to add course operator while not fulfilling constraint
+        while 0 < schedule_hours[idx] < min_credits:
+            if stats is not None:
+                stats.fill_iterations += 1
+            # the first course in catalog order is the smallest id heading any bucket that still fits
+            course = None
+            for bucket, (credits, courses) in enumerate(buckets):
+                if schedule_hours[idx] + credits > max_credits:
+                    break
+                position = positions[bucket]
+                while position < len(courses) and courses[position] in course_list:
+                    position += 1
+                positions[bucket] = position
+                if position < len(courses) and (course is None or courses[position] < course):
+                    course = courses[position]
+            if course is None:
+                # nothing left in the catalog fits this term
+                break
+            operator_stack.append(Placement(course, -1, idx + 1))
+            course_list.add(course)
+            schedule_hours[idx] += catalog.credits[course]
     return operator_stack
 
 
-def generate_scheduler_output(operator_stack):
+def filler_index(catalog):
+    """
+    Index of the courses fill_terms may add: per semester of the year, the prereq-free courses offered in it
+    bucketed by credit value. Buckets are ordered by credit value and hold course ids in catalog order. Built once
+    per catalog, from the catalog store's index when the catalog was interned from one.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :return: list indexed by semester of lists of (credits, course ids) pairs
+    """
+    index = catalog.derived.get('filler_index')
+    if index is None:
+        index = []
+        # a catalog store (see catalog_store) indexes the prereq-free courses per semester itself
+        prereq_free_courses = getattr(catalog.source, 'prereq_free_courses', None)
+        for semester in range(NUMBER_OF_SEMESTERS):
+            buckets = {}
+            if prereq_free_courses is not None:
+                candidates = sorted(catalog.ids[course] for course in prereq_free_courses(Semester(semester + 1).name))
+            else:
+                candidates = (course for course in range(catalog.catalog_size)
+                              if not catalog.disjuncts(course) and is_offered(catalog, course, semester + 1))
+            for course in candidates:
+                buckets.setdefault(catalog.credits[course], []).append(course)
+            index.append(sorted(buckets.items()))
+        index = catalog.derived['filler_index'] = index
+    return index
+
+
+def patch_filler_index(catalog, index, courses):
+    """
+    Builds the filler index of a catalog from the index of an earlier version of it with the same course ids,
+    moving only the given courses to the buckets they belong in now. The earlier index is left untouched.
+    :param catalog: interned catalog the new index is for
+    :param index: filler index of the earlier version, see filler_index
+    :param courses: ids of the courses whose credits, offered terms or prereqs changed
+    :return: filler index of catalog
+    """
+    courses = set(courses)
+    patched = []
+    for semester, semester_buckets in enumerate(index):
+        buckets = {credits: [course for course in bucket if course not in courses]
+                   for credits, bucket in semester_buckets}
+        for course in courses:
+            if not catalog.disjuncts(course) and is_offered(catalog, course, semester + 1):
+                bisect.insort(buckets.setdefault(catalog.credits[course], []), course)
+        patched.append(sorted((credits, bucket) for credits, bucket in buckets.items() if bucket))
+    return patched
+
+
+def generate_scheduler_output(catalog, operator_stack):
     """
     Takes the final operator stack, orders by term then by alphabet.
+    :param catalog: interned catalog the operator stack refers to
     :param operator_stack: stack list data structure that holds operators representing scheduled courses
     of the current state
     :return: solution dictionary sorted by term and alphabetically, includes prereqs
@@ -374,9 +1144,8 @@ def generate_scheduler_output(operator_stack):
     sorted_dictionary = {}
     # generate an operator schedule to organize by term
     unsorted_schedule = generate_operator_schedule(operator_stack)
-    #print(generate_schedule_hours(unsorted_schedule))
     for term in unsorted_schedule:
-        sorted_term = sorted(term)
+        sorted_term = sorted(to_operator(catalog, placement) for placement in term)
         # move to dictionary format
         for operator in sorted_term:
             course_key = Course(operator.EFF[0], operator.EFF[1])
@@ -387,151 +1156,361 @@ def generate_scheduler_output(operator_stack):
     return sorted_dictionary
 
 
-def state_init(course_descriptions, goal_conditions, initial_state):
+def to_operator(catalog, placement):
+    """Translates an interned placement back into an Operator of catalog courses and a Term."""
+    return Operator(catalog.prereq_tuple(placement.course, placement.disjunct), catalog.courses[placement.course],
+                    TERMS[placement.term], catalog.description(placement.course).credits)
+
+
+def state_init(catalog, goal_conditions, earliest=None):
     """
     Initializes the goal conditions, operator stack to a tuple appened into a tuple stack. Initialization advances
     the state by one step.
-    :param course_descriptions: course_descriptions: dictionary of offered Vanderbilt courses and related information
-    :param goal_conditions: list of courses required in a valid schedule
-    :param initial_state: list of courses already fulfilled, not scheduled
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param goal_conditions: list of course ids required in a valid schedule and not in the initial state
+    :param earliest: earliest_terms bounds; disjuncts whose prereqs cannot be completed in time are left out
     :return: tuple_stack with the first top course expanded in the top state and the first operator added
     to the operator stack
     """
     tuple_stack = []
     for goal in goal_conditions:
-        if not initial_state.count(goal):
-            if course_descriptions[goal].prereqs:
-                # per prereq add a tuple instance with appropriate operator stack
-                for prereqs in course_descriptions[goal].prereqs:
-                    state_instance = goal_conditions.copy()
-                    state_instance.remove(goal)
-                    state_instance += list(prereqs)
-                    idx = MAX_NUMBER_OF_TERMS
-                    while idx > 0:
-                        if course_descriptions[goal].terms.count(Term.initFromTermNo(idx).semester.name):
-                            break
-                        idx -= 1
-                    operator = Operator(prereqs, goal, Term.initFromTermNo(idx),
-                                        course_descriptions[goal].credits)
-                    operator_state_tuple = state_instance, [operator]
-                    tuple_stack.append(operator_state_tuple)
-            else:
-                state_instance = goal_conditions.copy()
-                state_instance.remove(goal)
-
-                operator = Operator((), goal, Term.initFromTermNo(MAX_NUMBER_OF_TERMS),
-                                    course_descriptions[goal].credits)
-                operator_state_tuple = state_instance, [operator]
+        other_goals = goal_conditions.copy()
+        other_goals.remove(goal)
+        goal_state = push_state(None, tuple(other_goals))
+        if catalog.disjuncts(goal):
+            # latest term offering the goal
+            idx = offered_terms(catalog)[goal].bit_length()
+            # a goal never offered in any term cannot start a branch
+            if not idx:
+                continue
+            # per prereq add a tuple instance with appropriate operator stack
+            for disjunct in catalog.disjuncts(goal):
+                if earliest and not disjunct_ready(catalog, goal, disjunct, idx, earliest):
+                    continue
+                state_instance = push_state(goal_state, catalog.prereq_ids,
+                                            catalog.prereq_start[disjunct], catalog.prereq_start[disjunct + 1])
+                operator_state_tuple = state_instance, OperatorNode(Placement(goal, disjunct, idx), None)
                 tuple_stack.append(operator_state_tuple)
+        else:
+            operator_state_tuple = goal_state, OperatorNode(Placement(goal, -1, MAX_NUMBER_OF_TERMS), None)
+            tuple_stack.append(operator_state_tuple)
     return tuple_stack
 
 
-def scheduled_term(course_descriptions, scheduled_course, operator_schedule):
+def scheduled_term(catalog, scheduled_course, schedule_index, earliest=None):
     """
     Finds the latest valid term for a course first by identifying prereq positioning then applying a credit hour
-    constraint (via function)
-    :param course_descriptions: course_descriptions: dictionary of offered Vanderbilt courses and related information
-    :param scheduled_course: course being considered for valid term
-    :param operator_schedule: list of list of operators, each list representing a term
-    :return: the valid term right behind a higher requirement or None if nonexistent
+    constraint (via function). If the course is already scheduled, its current placement is left out since the
+    new placement replaces it.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param scheduled_course: course id being considered for valid term
+    :param schedule_index: ScheduleIndex describing the schedule of the current search node
+    :param earliest: earliest_terms bounds; terms before the course's bound are never valid
+    :return: the valid term number right behind a higher requirement or None if nonexistent
     """
-    higher_term = None
-    schedule_hours = generate_schedule_hours(operator_schedule)
-    # first check for prereq constraints
-    for term in operator_schedule:
-        for operator in term:
-            for prereq in operator.PRE:
-                if prereq == scheduled_course:
-                    # a course that is a prereq of a higher requirement can be scheduled in the same term
-                    # as the higher requirement
-                    if is_higher_requirement(operator.EFF):
-                        # get final term after applying credit hour constraints
-                        constrained_term = apply_constraints(course_descriptions[scheduled_course],
-                                                             schedule_hours, operator_schedule.index(term))
-                        if constrained_term:
-                            higher_term = Term.initFromTermNo(constrained_term)
-                        else:
-                            higher_term = None
-                    else:
-                        constrained_term = apply_constraints(course_descriptions[scheduled_course],
-                                                             schedule_hours, operator_schedule.index(term) - 1)
-                        if constrained_term:
-                            return Term.initFromTermNo(constrained_term)
-                        else:
-                            return None
-        if higher_term:
-            return higher_term
-    # if no prereq constraint apply, find the first non-18+ term
-    current_term = MAX_NUMBER_OF_TERMS - 1
-    constrained_term = apply_constraints(course_descriptions[scheduled_course],
-                                         schedule_hours, current_term)
-    if constrained_term:
-        return Term.initFromTermNo(constrained_term)
-    else:
+    lowest_term = earliest[scheduled_course] if earliest else 1
+    if lowest_term > MAX_NUMBER_OF_TERMS:
         return None
+    schedule_hours = schedule_index.hours
+    dependent_terms = schedule_index.dependents.get(scheduled_course, {})
+    current = schedule_index.placements.get(scheduled_course)
+    if current:
+        schedule_hours = schedule_hours.copy()
+        schedule_hours[current.term - 1] -= catalog.credits[scheduled_course]
+        own_count = catalog.prereqs(current.disjunct).count(scheduled_course) if current.disjunct >= 0 else 0
+        if own_count:
+            dependent_terms = {term: counts.copy() for term, counts in dependent_terms.items()}
+            dependent_terms[current.term][catalog.higher[scheduled_course]] -= own_count
+    # first check for prereq constraints, earliest dependent term first
+    for term in sorted(dependent_terms):
+        plain_dependents, higher_dependents = dependent_terms[term]
+        if plain_dependents:
+            return apply_constraints(catalog, scheduled_course, schedule_hours, term - 2, lowest_term)
+        # a course that is a prereq of a higher requirement can be scheduled in the same term
+        # as the higher requirement
+        if higher_dependents:
+            # get final term after applying credit hour constraints
+            higher_term = apply_constraints(catalog, scheduled_course, schedule_hours, term - 1, lowest_term)
+            if higher_term:
+                return higher_term
+    # if no prereq constraint apply, find the first non-18+ term
+    return apply_constraints(catalog, scheduled_course, schedule_hours, MAX_NUMBER_OF_TERMS - 1, lowest_term)
 
 
-
-def apply_constraints(course_description, schedule_hours, current_term):
+def term_domain(catalog, course, schedule_index, earliest=None):
+    """
+    Computes the terms a course can currently be placed in, as scheduled_term would when the course is expanded:
+    at or after its earliest term, before the earliest term holding one of its plain dependents, offered and with
+    room for its credit hours. The course's own current placement is left out since a new one replaces it.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param course: course id
+    :param schedule_index: ScheduleIndex describing the schedule of the current search node
+    :param earliest: earliest_terms bounds, or None
+    :return: bitmask of term numbers (bit term_no - 1); empty exactly when scheduled_term returns None
+    """
+    lowest_term = earliest[course] if earliest else 1
+    if lowest_term > MAX_NUMBER_OF_TERMS:
+        return 0
+    credits = catalog.credits[course]
+    current = schedule_index.placements.get(course)
+    own_term = current.term if current else 0
+    own_count = catalog.prereqs(current.disjunct).count(course) if current and current.disjunct >= 0 else 0
+    latest_term = MAX_NUMBER_OF_TERMS
+    for term, (plain_dependents, _) in schedule_index.dependents.get(course, {}).items():
+        if term == own_term and own_count and not catalog.higher[course]:
+            plain_dependents -= own_count
+        if plain_dependents and term - 1 < latest_term:
+            latest_term = term - 1
+    if latest_term < lowest_term:
+        return 0
+    domain = offered_terms(catalog)[course] & ((1 << latest_term) - 1) & -(1 << (lowest_term - 1))
+    hours = schedule_index.hours
+    candidates = domain
+    while candidates:
+        term_no = candidates.bit_length()
+        candidates ^= 1 << (term_no - 1)
+        scheduled_hours = hours[term_no - 1] - (credits if term_no == own_term else 0)
+        if scheduled_hours + credits > term_capacity(term_no):
+            domain ^= 1 << (term_no - 1)
+    return domain
+
+
+def term_capacity(term_no):
+    """Returns the maximum credit hours of a term number."""
+    if SUMMER_TERMS and term_no % NUMBER_OF_SEMESTERS == 0:
+        return MAX_CREDITS_PER_SUMMER_TERM
+    return MAX_CREDITS_PER_NON_SUMMER_TERM
+
+
+def rejection_cause(catalog, course, schedule_index, earliest=None):
+    """
+    Classifies, after the fact, why scheduled_term found no term for a course (see search_stats.REJECTION_CAUSES).
+    The window checked is the one of the earliest plain dependent; the windows tried for higher requirement
+    dependents lie inside it.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param course: course id scheduled_term rejected
+    :param schedule_index: ScheduleIndex describing the schedule of the current search node
+    :param earliest: earliest_terms bounds, or None
+    :return: name of the cause
+    """
+    lowest_term = earliest[course] if earliest else 1
+    if lowest_term > MAX_NUMBER_OF_TERMS:
+        return 'unreachable'
+    latest_term = MAX_NUMBER_OF_TERMS
+    dependent_terms = schedule_index.dependents.get(course, {})
+    for term in sorted(dependent_terms):
+        if dependent_terms[term][0]:
+            latest_term = term - 1
+            break
+    if latest_term < lowest_term:
+        return 'prereq_order'
+    if not offered_terms(catalog)[course] & ((1 << latest_term) - 1) & -(1 << (lowest_term - 1)):
+        return 'offering'
+    return 'credit_cap'
+
+
+def apply_constraints(catalog, course, schedule_hours, current_term, lowest_term=1):
     """
     From the current latest term, this function applied the maximum credit hour constraint to find a valid term
     based on the current state of scheduled hours.
-    :param course_description: course_descriptions: dictionary of offered Vanderbilt courses and related information
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param course: course id being constrained to hour requirements
     :param schedule_hours: list of integers holding currently scheduled credit hours of each term
     associated by the index
-    :param current_term: course being constrained to hour requirements
-    :return: first valid term with credit hour constraints applied
+    :param current_term: index of the latest term the course may be placed in
+    :param lowest_term: earliest term number the course may be placed in
+    :return: first valid term number with credit hour constraints applied
     """
-    while current_term >= 0:
-        max_credits = MAX_CREDITS_PER_NON_SUMMER_TERM
-        if SUMMER_TERMS:
-            max_credits = MAX_CREDITS_PER_SUMMER_TERM if (current_term + 1) % NUMBER_OF_SEMESTERS == 0 \
-                else MAX_CREDITS_PER_NON_SUMMER_TERM
+    if current_term < lowest_term - 1:
+        return None
+    credits = catalog.credits[course]
+    # offered terms from lowest_term up to term number current_term + 1, latest first
+    candidates = offered_terms(catalog)[course] & ((1 << (current_term + 1)) - 1) & -(1 << (lowest_term - 1))
+    while candidates:
+        term_no = candidates.bit_length()
         # see if addition of course violates limit, then move to next term
-        if schedule_hours[current_term] + int(course_description.credits) <= max_credits:
-            for available_term in course_description.terms:
-                if Term.initFromTermNo(current_term + 1).semester.name == available_term:
-                    return current_term + 1
-        current_term -= 1
+        if schedule_hours[term_no - 1] + credits <= term_capacity(term_no):
+            return term_no
+        candidates ^= 1 << (term_no - 1)
     return None
 
 
-def is_higher_requirement(course):
+def earliest_terms(catalog, initial_ids=()):
+    """
+    Computes per course a lower bound on the term number it can be scheduled in: the course must be offered in
+    that term and, for at least one of its prereq disjunctions, every prereq must fit in an earlier term (the same
+    term for a higher requirement), recursively down the transitive prereq closure. A course whose chain can
+    never be completed within MAX_NUMBER_OF_TERMS is UNREACHABLE. The bounds for an empty initial state are
+    computed once per catalog; an initial state only relaxes the bounds of the courses depending on it.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param initial_ids: set of course ids already fulfilled, not scheduled
+    :return: list of earliest term numbers indexed by course id
     """
-    Checks if the course parameter is a higher requirement type.
-    :param course: course being checked if higher requirement
-    :return: boolean whether course is a higher requirement type
+    bounds = catalog.derived.get('earliest_terms')
+    if bounds is None:
+        bounds = [UNREACHABLE if catalog.disjuncts(course) else first_offered_term(catalog, course, 1)
+                  for course in range(len(catalog))]
+        catalog.derived['earliest_terms'] = relax_earliest_terms(
+            catalog, bounds, [course for course, bound in enumerate(bounds) if bound != UNREACHABLE])
+    if not initial_ids:
+        return bounds
+    # fulfilled courses only ever lower the bounds, so relaxing down from the empty state bounds is enough
+    bounds = bounds.copy()
+    for course in initial_ids:
+        bounds[course] = 0
+    return relax_earliest_terms(catalog, bounds, initial_ids)
+
+
+def relax_earliest_terms(catalog, bounds, lowered, lowest_term=1):
     """
-    if course[1][len(course[1]) - 1] == 'W':
-        return not course[1][:-1].isnumeric()
-    return not course[1].isnumeric()
+    Propagates lowered earliest term bounds to the courses depending on them, rechecking only the prereq
+    disjunctions that name a lowered course. Bounds only ever decrease, so courses behind a prereq cycle stay
+    UNREACHABLE.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param bounds: list of earliest term numbers indexed by course id, updated in place
+    :param lowered: course ids whose bounds were lowered
+    :param lowest_term: earliest term number a course may be scheduled in at all
+    :return: bounds
+    """
+    uses = catalog.prereq_uses()
+    pending = list(lowered)
+    while pending:
+        for course, disjunct in uses[pending.pop()]:
+            ready = max(bounds[prereq] for prereq in catalog.prereqs(disjunct))
+            bound = first_offered_term(catalog, course, max(ready + (0 if catalog.higher[course] else 1), lowest_term))
+            if bound < bounds[course]:
+                bounds[course] = bound
+                pending.append(course)
+    return bounds
+
+
+def first_offered_term(catalog, course, term_no):
+    """Returns the first term number at or after term_no (at least 1) that offers the course, or UNREACHABLE."""
+    if term_no > MAX_NUMBER_OF_TERMS:
+        return UNREACHABLE
+    candidates = offered_terms(catalog)[course] & -(1 << (max(term_no, 1) - 1))
+    # lowest set bit
+    return (candidates & -candidates).bit_length() if candidates else UNREACHABLE
+
+
+def disjunct_ready(catalog, course, disjunct, term, earliest):
+    """
+    Checks whether every prereq of a disjunction can be completed before a course placed in term (in the same term
+    for a higher requirement), according to the earliest_terms bounds.
+    """
+    latest = term if catalog.higher[course] else term - 1
+    return all(earliest[prereq] <= latest for prereq in catalog.prereqs(disjunct))
+
+
+def offered_terms(catalog):
+    """
+    Per course bitmask of the term numbers offering it (bit term_no - 1 for terms 1 to MAX_NUMBER_OF_TERMS), so
+    "latest offered term at or below t" is the highest set bit of the mask cut off above t. Built once per catalog.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :return: list of term bitmasks indexed by course id
+    """
+    masks = catalog.derived.get('offered_terms')
+    if masks is None:
+        year_masks = [schedule_term_mask(semesters) for semesters in range(1 << NUMBER_OF_SEMESTERS)]
+        all_semesters = (1 << NUMBER_OF_SEMESTERS) - 1
+        masks = catalog.derived['offered_terms'] = [year_masks[semesters & all_semesters]
+                                                    for semesters in catalog.term_masks]
+    return masks
+
+
+def schedule_term_mask(semesters):
+    """Returns the term bitmask of a Semester bitmask: the term pattern of one year repeated for every year."""
+    mask = 0
+    for term_no in range(1, MAX_NUMBER_OF_TERMS + 1):
+        if semesters & (1 << ((term_no - 1) % NUMBER_OF_SEMESTERS)):
+            mask |= 1 << (term_no - 1)
+    return mask
+
+
+def is_offered(catalog, course, term_no):
+    """
+    Checks the course's semester bitmask against the semester of a term number.
+    :param catalog: interned catalog of offered Vanderbilt courses and related information
+    :param course: course id being checked
+    :param term_no: term number, 1 being the first Fall
+    :return: boolean whether the course is offered in that term
+    """
+    return bool(catalog.term_masks[course] & (1 << ((term_no - 1) % NUMBER_OF_SEMESTERS)))
+
+
+def push_state(state, courses, start=0, end=None):
+    """
+    Pushes courses[start:end] on top of a state without copying either. The last course of the slice is the new top.
+    :param state: StateNode (or None for the empty state) the courses are pushed onto
+    :param courses: sequence holding the pushed courses, e.g. the catalog's prereq_ids
+    :param start: index of the first pushed course
+    :param end: index after the last pushed course, the end of courses by default
+    :return: the new StateNode, or state itself when nothing is pushed
+    """
+    end = len(courses) if end is None else end
+    if end <= start:
+        return state
+    key = state.key if state else 0
+    for idx in range(start, end):
+        key += goal_key(courses[idx])
+    return StateNode(courses, start, end, state, key & KEY_MASK, (state.size if state else 0) + end - start)
+
+
+def pop_state(state):
+    """Returns the state below the top course of a StateNode, sharing every node underneath."""
+    if state.end - 1 > state.start:
+        return StateNode(state.courses, state.start, state.end - 1, state.parent,
+                         (state.key - goal_key(state.courses[state.end - 1])) & KEY_MASK, state.size - 1)
+    return state.parent
+
+
+def top_of_state(state):
+    """Returns the top course id of a non-empty state."""
+    return state.courses[state.end - 1]
+
+
+def generate_operator_stack(operators):
+    """
+    Flattens an OperatorNode chain into a plain list of operators. A course that was rescheduled appears in the chain
+    more than once; only its newest placement is kept.
+    :param operators: OperatorNode of the newest operator, or None
+    :return: list of operators (newest first) representing the scheduled courses
+    """
+    operator_stack = []
+    seen = set()
+    while operators is not None:
+        if operators.placement.course not in seen:
+            seen.add(operators.placement.course)
+            operator_stack.append(operators.placement)
+        operators = operators.parent
+    return operator_stack
 
 
 def in_schedule(operator_schedule, course):
     """
     Checks if the course parameter is found in the current schedule.
     :param operator_schedule: list of list of operators, each list representing a term
-    :param course: course being checked if already in the schedule
-    :return: boolean whether course is already scheduled
+    :param course: course id being checked if already in the schedule
+    :return: term number of the course if it is already scheduled, otherwise None
     """
     for term in operator_schedule:
         for operator in term:
             # course already scheduled in earliest necessary term
-            if operator.EFF == course:
-                return operator.ScheduledTerm
+            if operator.course == course:
+                return operator.term
     return None
 
 
 def generate_schedule(operator_stack):
     """
-    Constructs a list of lists of course tuples. Each term is ordered by the index of the top list.
+    Constructs a list of lists of course ids. Each term is ordered by the index of the top list.
     :param operator_stack: stack list data structure that holds operators representing scheduled courses
     of the current state
-    :return: schedule (list of lists of courses) of regular tuple courses
+    :return: schedule (list of lists of courses) of course ids
     """
     schedule = [[] for _ in range(MAX_NUMBER_OF_TERMS)]
     for operator in operator_stack:
-        schedule[operator.ScheduledTerm.termNo - 1].append(operator.EFF)
+        schedule[operator.term - 1].append(operator.course)
     return schedule
 
 
@@ -544,22 +1523,18 @@ def generate_operator_schedule(operator_stack):
     """
     schedule = [[] for _ in range(MAX_NUMBER_OF_TERMS)]
     for operator in operator_stack:
-        schedule[operator.ScheduledTerm.termNo - 1].append(operator)
+        schedule[operator.term - 1].append(operator)
     return schedule
 
 
-def generate_schedule_hours(schedule):
+def generate_schedule_hours(catalog, schedule):
     """
     Constructs a list of integers holding the total scheduled credit hours per term, associated by index.
-    :param schedule:
+    :param catalog: interned catalog the schedule refers to
+    :param schedule: list of list of operators, each list representing a term
     :return: schedule (list of integers) of scheduled total credit hours
     """
-    schedule_hours = []
-    for term in schedule:
-        schedule_hours.append(0)
-        for operator in term:
-            schedule_hours[schedule.index(term)] += int(operator.credits)
-    return schedule_hours
+    return [sum(catalog.credits[operator.course] for operator in term) for term in schedule]
 
 
 def generate_course_list(operator_stack):
@@ -568,11 +1543,11 @@ def generate_course_list(operator_stack):
     courses (in operator form).
     :param operator_stack: stack list data structure that holds operators representing scheduled
     courses of the current state
-    :return: plain list of courses from operator stack
+    :return: plain list of course ids from operator stack
     """
     course_list = []
     for operator in operator_stack:
-        course_list.append(operator.EFF)
+        course_list.append(operator.course)
     return course_list
 
 """